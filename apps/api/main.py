@@ -2,7 +2,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import RedirectResponse
 from pathlib import Path
 
@@ -11,20 +11,27 @@ from modules.scan_malware.service import router as malware_router
 from modules.pcap.service import router as pcap_router
 from modules.reports.service import router as reporting_router
 from modules.login.service import router as auth_router
+from apps.api.static import CachedStaticFiles
+from core.config import load_config
+from core.responses import FastJSONResponse
 
-app = FastAPI(title="Defense Capstone API", version="0.1.0")
+app = FastAPI(title="Defense Capstone API", version="0.1.0", default_response_class=FastJSONResponse)
+# Compress JSON/HTML on the fly; precompressed static twins pass through untouched
+app.add_middleware(GZipMiddleware, minimum_size=512, compresslevel=5)
 app.include_router(phishing_router)
 app.include_router(malware_router)
 app.include_router(pcap_router)
 app.include_router(reporting_router)
 app.include_router(auth_router)
 
-# Absolute path to project-root/public
-STATIC_DIR = Path(__file__).resolve().parents[2] / "public"
-assert STATIC_DIR.exists(), f"Static dir not found: {STATIC_DIR}"
+# Absolute path to project-root/public; strict resolve raises if it is missing (survives -O)
+STATIC_DIR = (Path(__file__).parent / ".." / ".." / "public").resolve(strict=True)
+
+# Small hot files served from memory (restart to pick up edits to these)
+STATIC_PRELOAD = (load_config().get("app") or {}).get("static_preload", ["index.html", "favicon.ico"])
 
 # Serve the site at /app to avoid any conflicts
-app.mount("/app", StaticFiles(directory=str(STATIC_DIR), html=True), name="app")
+app.mount("/app", CachedStaticFiles(directory=str(STATIC_DIR), html=True, preload=STATIC_PRELOAD), name="app")
 
 # Redirect / -> /app/index.html
 @app.get("/", include_in_schema=False)
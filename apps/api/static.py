@@ -0,0 +1,156 @@
+"""
+Static file serving for the dashboard mounted at /app.
+
+Wraps Starlette's StaticFiles with HTTP caching headers:
+- fingerprinted assets (e.g. app.3f9c2a1b.js) are cached for a year as immutable
+- everything else (HTML, unversioned CSS) carries a weak mtime/size ETag and
+  must be revalidated, which costs a 304 instead of a full download
+- a small allowlist of hot files can be preloaded into memory at startup and
+  served without touching the filesystem (edits to those need a restart)
+- precompressed twins (style.css.br / style.css.gz next to style.css) are found
+  once at startup and served as-is to clients that accept the encoding
+"""
+from __future__ import annotations
+
+import hashlib
+import mimetypes
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+# name.<hex hash>.ext, as emitted by most asset bundlers
+FINGERPRINT_RE = re.compile(r"\.[0-9a-f]{8,}\.(?:js|css|woff2)$", re.I)
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Precompressed twin suffixes, in order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _etag_matches(etag: str, if_none_match: str) -> bool:
+    """Weak comparison per RFC 9110: ignore W/ prefixes on both sides."""
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag.removeprefix("W/")
+    return bare in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+def _accepted_encodings(scope: Scope) -> set[str]:
+    accepted = set()
+    for item in Headers(scope=scope).get("accept-encoding", "").split(","):
+        coding, _, params = item.partition(";")
+        if params.replace(" ", "") not in ("q=0", "q=0.0"):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def _cache_control(path: str) -> str:
+    return IMMUTABLE if FINGERPRINT_RE.search(path) else REVALIDATE
+
+
+class _MemoryAsset:
+    """
+    A file read once at startup, with its content type and a weak content-hash ETag.
+    Weak because GZipMiddleware may send the same body gzip-encoded under this ETag,
+    and a strong validator would have to differ per content-coding.
+    """
+
+    def __init__(self, path: Path):
+        self.body = path.read_bytes()
+        self.media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        self.headers = {
+            "ETag": f'W/"{hashlib.sha256(self.body).hexdigest()}"',
+            "Cache-Control": _cache_control(path.name),
+        }
+
+    def response(self, scope: Scope) -> Response:
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        if if_none_match and _etag_matches(self.headers["ETag"], if_none_match):
+            return Response(status_code=304, headers=self.headers)
+        return Response(content=self.body, media_type=self.media_type, headers=self.headers)
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles with Cache-Control, cheap mtime/size ETags and optional in-memory hot files."""
+
+    def __init__(self, *args, preload: Iterable[str] = (), **kwargs):
+        super().__init__(*args, **kwargs)
+        self._memory: Dict[str, _MemoryAsset] = {}
+        root = Path(self.directory) if self.directory is not None else None
+        for rel in preload:
+            if root is not None and (root / rel).is_file():
+                self._memory[rel] = _MemoryAsset(root / rel)
+        self._twins = self._find_twins()
+
+    def _find_twins(self) -> Dict[str, Dict[str, str]]:
+        """Map real path of each file -> {encoding: twin path} for .br/.gz siblings."""
+        twins: Dict[str, Dict[str, str]] = {}
+        if self.directory is None:
+            return twins
+        for dirpath, _, files in os.walk(os.path.realpath(self.directory)):
+            names = set(files)
+            for name in files:
+                for encoding, suffix in ENCODINGS:
+                    if name.endswith(suffix) and name[: -len(suffix)] in names:
+                        original = os.path.join(dirpath, name[: -len(suffix)])
+                        twins.setdefault(original, {})[encoding] = os.path.join(dirpath, name)
+        return twins
+
+    def _memory_asset(self, path: str, scope: Scope) -> Optional[_MemoryAsset]:
+        key = path.replace(os.sep, "/")
+        if key == ".":
+            # Directory URL: only serve index.html once the trailing-slash redirect has happened
+            if not (self.html and scope["path"].endswith("/")):
+                return None
+            key = "index.html"
+        return self._memory.get(key)
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if scope["method"] in ("GET", "HEAD"):
+            asset = self._memory_asset(path, scope)
+            if asset is not None:
+                return asset.response(scope)
+        return await super().get_response(path, scope)
+
+    def file_response(
+        self,
+        full_path: str | os.PathLike[str],
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        full_path = os.fspath(full_path)
+        etag = f'W/"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+        headers = {"ETag": etag, "Cache-Control": _cache_control(full_path)}
+        media_type = None
+
+        twins = self._twins.get(full_path)
+        if twins and status_code == 200:
+            headers["Vary"] = "Accept-Encoding"
+            accepted = _accepted_encodings(scope)
+            for encoding, _ in ENCODINGS:
+                if encoding in accepted and encoding in twins:
+                    try:
+                        twin_stat = os.stat(twins[encoding])
+                    except OSError:
+                        break
+                    media_type = mimetypes.guess_type(full_path)[0]
+                    full_path, stat_result = twins[encoding], twin_stat
+                    etag = f'W/"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}-{encoding}"'
+                    headers.update({"ETag": etag, "Content-Encoding": encoding})
+                    break
+
+        # Only short-circuit real hits; html=True serves 404.html with status 404
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        if status_code == 200 and if_none_match and _etag_matches(etag, if_none_match):
+            return Response(status_code=304, headers=headers)
+        return FileResponse(
+            full_path, status_code=status_code, stat_result=stat_result, headers=headers, media_type=media_type
+        )
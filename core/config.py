@@ -1,7 +1,26 @@
-import os, yaml
-from typing import Any, Dict
+import copy, os, yaml
+from typing import Any, Dict, Tuple
+
+# libyaml-backed loader when available; the pure-Python one is much slower
+_Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Parsed YAML keyed by (abspath, mtime_ns, size) so edits are picked up
+_yaml_cache: Dict[Tuple[str, int, int], Any] = {}
+
+def _parsed_yaml(path: str) -> Any:
+    """Parse a YAML file, reusing the previous result while the file is unchanged."""
+    abspath = os.path.abspath(path)
+    st = os.stat(abspath)
+    key = (abspath, st.st_mtime_ns, st.st_size)
+    if key not in _yaml_cache:
+        with open(abspath, "r", encoding="utf-8") as f:
+            data = yaml.load(f, Loader=_Loader)
+        for stale in [k for k in _yaml_cache if k[0] == abspath]:
+            del _yaml_cache[stale]
+        _yaml_cache[key] = data
+    # Callers (e.g. logging.config.dictConfig) may mutate the result
+    return copy.deepcopy(_yaml_cache[key])
 
 def load_config(path: str = None) -> Dict[str, Any]:
     cfg_path = path or os.getenv("PHISH_CFG", "config/base.yaml")
-    with open(cfg_path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+    return _parsed_yaml(cfg_path)
@@ -6,26 +6,37 @@ from pymongo import MongoClient
 from pymongo.server_api import ServerApi
 from pymongo.errors import PyMongoError
 
+# Motor is optional; only async callers (auth) need it
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+except Exception as exc:  # pragma: no cover - optional dependency
+    AsyncIOMotorClient = None  # type: ignore
+    MOTOR_IMPORT_ERROR = exc
+else:  # pragma: no cover
+    MOTOR_IMPORT_ERROR = None
+
+# Resolve the CA bundle path once instead of on every get_db call
+_CA_FILE = certifi.where()
+
 _client: Optional[MongoClient] = None
+_async_client = None  # AsyncIOMotorClient | None
 
 
 def reset_db() -> None:
-    """Close and clear the cached client. Call this before reloading config."""
-    global _client
-    if _client is not None:
-        try:
-            _client.close()
-        except Exception:
-            pass
+    """Close and clear the cached clients. Call this before reloading config."""
+    global _client, _async_client
+    for client in (_client, _async_client):
+        if client is not None:
+            try:
+                client.close()
+            except Exception:
+                pass
     _client = None
+    _async_client = None
 
 
-def get_db(cfg: Dict[str, Any]):
-    global _client
-    mcfg = cfg.get("mongodb", {})
-    if not mcfg.get("enabled", False):
-        return None
-
+def _connection(mcfg: Dict[str, Any]) -> tuple[str, Dict[str, Any]]:
+    """Resolve the URI and client kwargs shared by the sync and async clients."""
     uri = os.environ.get("MONGODB_URI") or mcfg.get("uri")
     if not uri:
         raise RuntimeError("MongoDB enabled but no URI provided. Set MONGODB_URI or mongodb.uri.")
@@ -34,15 +45,32 @@ def get_db(cfg: Dict[str, Any]):
         "server_api": ServerApi("1"),
         "serverSelectionTimeoutMS": 30000,
         "tls": bool(mcfg.get("tls", True)),
-        "tlsCAFile": certifi.where(),  # <-- key line
+        "tlsCAFile": _CA_FILE,  # <-- key line
+        "maxPoolSize": int(mcfg.get("max_pool_size", 50)),
+        "minPoolSize": int(mcfg.get("min_pool_size", 5)),
+        "maxIdleTimeMS": 30_000,
+        "retryWrites": True,
     }
+    if mcfg.get("compressors"):
+        kwargs["compressors"] = mcfg["compressors"]
     if mcfg.get("allow_invalid_certs", False):
         kwargs["tlsAllowInvalidCertificates"] = True  # TEMP ONLY if behind TLS interception
+    return uri, kwargs
+
+
+def get_db(cfg: Dict[str, Any]):
+    global _client
+    mcfg = cfg.get("mongodb", {})
+    if not mcfg.get("enabled", False):
+        return None
+
+    uri, kwargs = _connection(mcfg)
 
     if _client is None:
         try:
             _client = MongoClient(uri, **kwargs)
-            _client.admin.command("ping")  # force handshake now
+            if mcfg.get("ping_on_connect", False):
+                _client.admin.command("ping")  # force handshake now
         except PyMongoError as e:
             raise RuntimeError(
                 f"Failed to connect to MongoDB: {e}\n"
@@ -50,4 +78,22 @@ def get_db(cfg: Dict[str, Any]):
             ) from e
 
     dbname = mcfg.get("database", "defensedb")
-    return _client[dbname]
\ No newline at end of file
+    return _client[dbname]
+
+
+def get_async_db(cfg: Dict[str, Any]):
+    """Motor counterpart of get_db. The client connects lazily on first await."""
+    global _async_client
+    mcfg = cfg.get("mongodb", {})
+    if not mcfg.get("enabled", False):
+        return None
+
+    uri, kwargs = _connection(mcfg)
+    if AsyncIOMotorClient is None:
+        raise RuntimeError(f"Motor not installed; async MongoDB unavailable ({MOTOR_IMPORT_ERROR})")
+
+    if _async_client is None:
+        _async_client = AsyncIOMotorClient(uri, **kwargs)
+
+    dbname = mcfg.get("database", "defensedb")
+    return _async_client[dbname]
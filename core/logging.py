@@ -1,6 +1,7 @@
-import logging.config, yaml
+import logging.config
+
+from core.config import _parsed_yaml
 
 def setup_logging(path: str = "config/logging.yaml"):
-    with open(path, "r", encoding="utf-8") as f:
-        cfg = yaml.safe_load(f)
+    cfg = _parsed_yaml(path)
     logging.config.dictConfig(cfg)
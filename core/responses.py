@@ -0,0 +1,43 @@
+"""
+JSON response class used as the API default.
+
+Renders with orjson when it is installed (much faster than json.dumps and
+writes bytes directly); falls back to Starlette's JSONResponse otherwise.
+"""
+from __future__ import annotations
+
+from typing import Any
+
+from starlette.responses import JSONResponse
+
+# orjson is optional; without it responses use the stdlib encoder
+try:
+    import orjson
+except Exception as exc:  # pragma: no cover - optional dependency
+    orjson = None  # type: ignore
+    ORJSON_IMPORT_ERROR = exc
+else:  # pragma: no cover
+    ORJSON_IMPORT_ERROR = None
+
+try:
+    from bson import ObjectId
+except Exception:  # pragma: no cover - pymongo not installed
+    ObjectId = None  # type: ignore
+
+_OPTIONS = (orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY) if orjson is not None else 0
+
+
+# Fallback for types orjson does not know (Mongo ObjectIds that slipped through)
+def _default(obj: Any) -> Any:
+    if ObjectId is not None and isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (naive datetimes as UTC, numpy arrays natively)."""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, default=_default, option=_OPTIONS)
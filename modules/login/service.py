@@ -13,20 +13,25 @@ Notes:
 """
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import hmac
 import os
 import secrets
+import threading
 import time
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Any, Dict, Optional
 
 import bcrypt
 import jwt
+from cachetools import TTLCache
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from pymongo.errors import InvalidOperation
 
 from core.config import load_config
-from core.db.mongodb import get_db
+from core.db.mongodb import get_async_db
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 security = HTTPBearer(auto_error=False)
@@ -34,17 +39,38 @@ security = HTTPBearer(auto_error=False)
 _cfg: Dict[str, Any] = {}
 _db = None
 _dev_secret: str | None = None
+_hs256_key: bytes | None = None
+_bcrypt_rounds = 10
+
+# Decoder with its options built once; exp and sub are mandatory claims
+_jwt_decoder = jwt.PyJWT(options={"require": ["exp", "sub"]})
+
+# Short-lived cache of successful bcrypt checks. Keys are HMACs under a
+# per-process pepper so raw passwords never sit in memory as dict keys.
+_verify_cache: TTLCache = TTLCache(maxsize=10_000, ttl=60)
+_verify_lock = threading.Lock()
+_pepper = secrets.token_bytes(32)
+
+# Decoded (sub, exp) per token digest; expiry is re-checked on every hit.
+_jwt_cache: TTLCache = TTLCache(maxsize=10_000, ttl=30)
+_jwt_lock = threading.Lock()
+
+# Sanitized user documents by email, to skip the Mongo lookup on /auth/me.
+_user_cache: TTLCache = TTLCache(maxsize=5_000, ttl=60)
+_user_lock = threading.Lock()
 
 # Load configuration and initialize database connection
 def _load_db():
-    global _cfg, _db
+    global _cfg, _db, _bcrypt_rounds
     _cfg = load_config()
+    # BCRYPT_ROUNDS env wins over auth.bcrypt_rounds; raise it for production
+    _bcrypt_rounds = int(os.getenv("BCRYPT_ROUNDS") or (_cfg.get("auth") or {}).get("bcrypt_rounds", 10))
     try:
-        _db = get_db(_cfg)
+        _db = get_async_db(_cfg)
     except Exception:
         _db = None
 
-# Get the users collection
+# Get the (Motor) users collection
 def _users_col():
     if _db is None:
         return None
@@ -67,39 +93,71 @@ def _get_secret() -> str:
         _dev_secret = secrets.token_urlsafe(32)
     return _dev_secret
 
+# HS256 key bytes, encoded once per process
+def _signing_key() -> bytes:
+    global _hs256_key
+    if _hs256_key is None:
+        _hs256_key = _get_secret().encode("utf-8")
+    return _hs256_key
+
 # Hash a password using bcrypt
 def _hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(_bcrypt_rounds)).decode("utf-8")
 
 # Verify a password against a stored hash
 def _verify_password(password: str, stored: str) -> bool:
     if not stored:
         return False
+    pw, hashed = password.encode("utf-8"), stored.encode("utf-8")
+    key = hmac.new(_pepper, pw + b"\x00" + hashed, hashlib.sha256).digest()
+    with _verify_lock:
+        if _verify_cache.get(key):
+            return True
     try:
-        return bcrypt.checkpw(password.encode("utf-8"), stored.encode("utf-8"))
+        ok = bcrypt.checkpw(pw, hashed)
     except ValueError:
         # fallback: plain text match
         return password == stored
+    # Only cache successes so failed guesses always pay the full bcrypt cost
+    if ok:
+        with _verify_lock:
+            _verify_cache[key] = True
+    return ok
 
 # Create a JWT token for the given email
 def _make_token(email: str, expires_minutes: int = 60 * 24) -> str:
-    exp = datetime.utcnow() + timedelta(minutes=expires_minutes)
-    payload = {"sub": email, "exp": exp, "iat": datetime.utcnow()}
-    return jwt.encode(payload, _get_secret(), algorithm="HS256")
+    now = int(time.time())
+    payload = {"sub": email, "iat": now, "exp": now + expires_minutes * 60}
+    return jwt.encode(payload, _signing_key(), algorithm="HS256")
 
 # Decode and validate a JWT token, returning the email
 def _decode_token(token: str) -> str:
+    h = hashlib.sha256(token.encode("utf-8")).digest()[:16]
+    with _jwt_lock:
+        cached = _jwt_cache.get(h)
+    if cached is not None:
+        sub, exp = cached
+        if exp > time.time():
+            return sub
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
     try:
-        data = jwt.decode(token, _get_secret(), algorithms=["HS256"])
-        return data["sub"]
+        data = _jwt_decoder.decode(token, _signing_key(), algorithms=["HS256"])
+        sub = data["sub"]
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
+    with _jwt_lock:
+        _jwt_cache[h] = (sub, float(data["exp"]))
+    return sub
 
 # Get the current user from the token
-def _get_current_user(creds: Optional[HTTPAuthorizationCredentials] = Depends(security)) -> Dict[str, Any]:
+async def _get_current_user(creds: Optional[HTTPAuthorizationCredentials] = Depends(security)) -> Dict[str, Any]:
     if creds is None:
         raise HTTPException(status_code=401, detail="Missing credentials")
     email = _decode_token(creds.credentials)
+    with _user_lock:
+        cached = _user_cache.get(email)
+    if cached is not None:
+        return dict(cached)
     col = _users_col()
 
     # Fetch user from database
@@ -108,14 +166,14 @@ def _get_current_user(creds: Optional[HTTPAuthorizationCredentials] = Depends(se
     
     # Handle potential InvalidOperation if the DB connection was closed
     try:
-        user = col.find_one({"email": email})
+        user = await col.find_one({"email": email})
     except InvalidOperation:
         # Mongo client was closed; reload and retry once
         _load_db()
         col = _users_col()
         if col is None:
             raise HTTPException(status_code=503, detail="Auth database unavailable")
-        user = col.find_one({"email": email})
+        user = await col.find_one({"email": email})
 
     # User not found
     if not user:
@@ -123,11 +181,18 @@ def _get_current_user(creds: Optional[HTTPAuthorizationCredentials] = Depends(se
     user["_id"] = str(user["_id"])
     user.pop("password_hash", None)
     user.pop("password", None)
+    with _user_lock:
+        _user_cache[email] = dict(user)
     return user
 
+# Drop a cached user document (call after any change to the stored user)
+def invalidate_user_cache(email: str) -> None:
+    with _user_lock:
+        _user_cache.pop(email, None)
+
 # Register a new user
 @router.post("/register")
-def register(payload: Dict[str, str]) -> Dict[str, Any]:
+async def register(payload: Dict[str, str]) -> Dict[str, Any]:
     """
     Create a new user. Requires mongodb.enabled and a "users" collection.
     """
@@ -140,19 +205,22 @@ def register(payload: Dict[str, str]) -> Dict[str, Any]:
     if not email or not password:
         raise HTTPException(status_code=400, detail="Email and password are required")
 
-    if col.find_one({"email": email}):
+    if await col.find_one({"email": email}):
         raise HTTPException(status_code=400, detail="User already exists")
 
-    col.insert_one({
+    # bcrypt is CPU-bound; hash on a worker thread to keep the event loop free
+    password_hash = await asyncio.to_thread(_hash_password, password)
+    await col.insert_one({
         "email": email,
-        "password_hash": _hash_password(password),
+        "password_hash": password_hash,
         "created_at": datetime.utcnow(),
     })
+    invalidate_user_cache(email)
     return {"ok": True, "message": "Registered"}
 
 # User login
 @router.post("/login")
-def login(payload: Dict[str, str]) -> Dict[str, Any]:
+async def login(payload: Dict[str, str]) -> Dict[str, Any]:
     col = _users_col()
 
     # Fetch user from database
@@ -168,13 +236,13 @@ def login(payload: Dict[str, str]) -> Dict[str, Any]:
 
     # Handle potential InvalidOperation if the DB connection was closed
     try:
-        user = col.find_one({"email": email})
+        user = await col.find_one({"email": email})
     except InvalidOperation:
         _load_db()
         col = _users_col()
         if col is None:
             raise HTTPException(status_code=503, detail="Auth database unavailable")
-        user = col.find_one({"email": email})
+        user = await col.find_one({"email": email})
 
     # User not found
     if not user:
@@ -183,7 +251,7 @@ def login(payload: Dict[str, str]) -> Dict[str, Any]:
     stored = user.get("password_hash") or user.get("password")
 
     # Verify password
-    if not _verify_password(password, stored):
+    if not await asyncio.to_thread(_verify_password, password, stored):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     token = _make_token(email)
@@ -191,7 +259,7 @@ def login(payload: Dict[str, str]) -> Dict[str, Any]:
 
 # Get current user info
 @router.get("/me")
-def me(user=Depends(_get_current_user)) -> Dict[str, Any]:
+async def me(user=Depends(_get_current_user)) -> Dict[str, Any]:
     return {"user": user}
 
 
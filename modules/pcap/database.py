@@ -4,13 +4,18 @@ Handles MongoDB connections and operations for storing analysis results.
 """
 from __future__ import annotations
 
+import asyncio
+import logging
 import os
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 # Attempt to import Motor for async MongoDB operations
 try:
     from motor.motor_asyncio import AsyncIOMotorClient
+    from bson import ObjectId
+    from bson.errors import InvalidId
+    from pymongo import ASCENDING, DESCENDING, IndexModel
 
 # pragma: no cover - optional dependency
 except Exception as exc:  # pragma: no cover - optional dependency
@@ -19,6 +24,11 @@ except Exception as exc:  # pragma: no cover - optional dependency
 else: # pragma: no cover
     MOTOR_IMPORT_ERROR = None
 
+logger = logging.getLogger(__name__)
+
+# List views skip the per-packet array, usually the bulk of an analysis document
+SUMMARY_PROJECTION = {"packet_details": 0}
+
 # MongoDB handler class
 class Database:
     """MongoDB handler for PCAP analysis results."""
@@ -41,12 +51,12 @@ class Database:
         """Establish connection to MongoDB."""
         # Check if Motor is available
         if AsyncIOMotorClient is None:
-            print(f"[WARN] Motor not installed; skipping Mongo logging ({MOTOR_IMPORT_ERROR})")
+            logger.warning("Motor not installed; skipping Mongo logging (%s)", MOTOR_IMPORT_ERROR)
             return False
 
         # Check if URI is set
         if not self.mongo_uri:
-            print("[INFO] MongoDB URI not set; skipping Mongo logging")
+            logger.info("MongoDB URI not set; skipping Mongo logging")
             return False
 
         # Attempt to connect
@@ -61,8 +71,7 @@ class Database:
             return True
         # pylint: disable=broad-except
         except Exception as e:  # pragma: no cover - external dependency
-            print(f"[ERROR] MongoDB connection failed: {e}")
-            print("  Make sure MongoDB is running and MONGODB_URI is correct.")
+            logger.error("MongoDB connection failed: %s. Make sure MongoDB is running and MONGODB_URI is correct.", e)
             return False
 
     # Initialize indexes
@@ -73,32 +82,58 @@ class Database:
         if self._indexes_ready:
             return
         try:
-            await self.analyses_collection.create_index([("timestamp", -1)])
-            await self.analyses_collection.create_index([("filename", 1)])
-            await self.threats_collection.create_index([("threat_level", 1)])
-            await self.threats_collection.create_index([("timestamp", -1)])
+            # One createIndexes command per collection instead of one per index
+            await self.analyses_collection.create_indexes([
+                IndexModel([("timestamp", DESCENDING)]),
+                # Serves get_analysis_by_filename (equality + newest-first) from the index
+                IndexModel([("filename", ASCENDING), ("timestamp", DESCENDING)], name="fn_ts"),
+            ])
+            await self.threats_collection.create_indexes([
+                IndexModel([("threat_level", ASCENDING)]),
+                IndexModel([("timestamp", DESCENDING)]),
+                # Serves get_high_threats / high-severity counts without an in-memory sort
+                IndexModel([("threat_summary.overall_threat_level", ASCENDING), ("timestamp", DESCENDING)], name="lvl_ts"),
+            ])
             self._indexes_ready = True
-            print("[OK] Database indexes initialized")
+            logger.info("Database indexes initialized")
         except Exception as e:  # pragma: no cover - external dependency
-            print(f"Warning: Could not create indexes: {e}")
+            logger.warning("Could not create indexes: %s", e)
 
-    # Save analysis results
-    async def save_analysis(self, filename: str, analysis_data: Dict[str, Any]) -> str:
-        """Save PCAP analysis results to database."""
-        if self.analyses_collection is None:
-            return ""
-
-        document = {
+    # Build the stored analysis document
+    @staticmethod
+    def _analysis_document(filename: str, analysis_data: Dict[str, Any], ts: datetime) -> Dict[str, Any]:
+        return {
             "filename": filename,
-            "timestamp": datetime.utcnow(),
+            "timestamp": ts,
             "basic_stats": analysis_data.get("basic_stats", {}),
             "protocol_stats": analysis_data.get("protocol_stats", {}),
             "top_talkers": analysis_data.get("top_talkers", []),
             "packet_details": analysis_data.get("packet_details", []),
         }
 
+    # Build the stored threat document
+    @staticmethod
+    def _threat_document(filename: str, threat_data: Dict[str, Any], ts: datetime) -> Dict[str, Any]:
+        return {
+            "filename": filename,
+            "timestamp": ts,
+            "threat_summary": threat_data.get("threat_summary", {}),
+            "syn_flood_detection": threat_data.get("syn_flood_detection", {}),
+            "port_scan_detection": threat_data.get("port_scan_detection", {}),
+            "volume_anomaly_detection": threat_data.get("volume_anomaly_detection", {}),
+            "abuseipdb_results": threat_data.get("abuseipdb_results", {}),
+        }
+
+    # Save analysis results
+    async def save_analysis(self, filename: str, analysis_data: Dict[str, Any]) -> str:
+        """Save PCAP analysis results to database."""
+        if self.analyses_collection is None:
+            return ""
+
+        document = self._analysis_document(filename, analysis_data, datetime.utcnow())
         result = await self.analyses_collection.insert_one(document)
-        print(f"[OK] Analysis saved with ID: {result.inserted_id}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Analysis saved id=%s", result.inserted_id)
         return str(result.inserted_id)
 
     # Save threat analysis
@@ -107,31 +142,54 @@ class Database:
         if self.threats_collection is None:
             return ""
 
-        document = {
-            "filename": filename,
-            "timestamp": datetime.utcnow(),
-            "threat_summary": threat_data.get("threat_summary", {}),
-            "syn_flood_detection": threat_data.get("syn_flood_detection", {}),
-            "port_scan_detection": threat_data.get("port_scan_detection", {}),
-            "volume_anomaly_detection": threat_data.get("volume_anomaly_detection", {}),
-            "abuseipdb_results": threat_data.get("abuseipdb_results", {}),
-        }
-
+        document = self._threat_document(filename, threat_data, datetime.utcnow())
         result = await self.threats_collection.insert_one(document)
-        print(f"[OK] Threats saved with ID: {result.inserted_id}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Threats saved id=%s", result.inserted_id)
         return str(result.inserted_id)
 
+    # Save analysis + threats for one capture
+    async def save_analysis_and_threats(
+        self, filename: str, analysis_data: Dict[str, Any], threat_data: Dict[str, Any]
+    ) -> Tuple[str, str]:
+        """Save both documents with overlapping round-trips; returns (analysis_id, threat_id)."""
+        if self.analyses_collection is None or self.threats_collection is None:
+            return "", ""
+
+        ts = datetime.utcnow()
+        analysis_res, threat_res = await asyncio.gather(
+            self.analyses_collection.insert_one(self._analysis_document(filename, analysis_data, ts)),
+            self.threats_collection.insert_one(self._threat_document(filename, threat_data, ts)),
+        )
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Analysis saved id=%s; threats id=%s", analysis_res.inserted_id, threat_res.inserted_id)
+        return str(analysis_res.inserted_id), str(threat_res.inserted_id)
+
     # Retrieve recent analyses
     async def get_recent_analyses(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Retrieve recent analysis results."""
         if self.analyses_collection is None:
             return []
-        cursor = self.analyses_collection.find().sort("timestamp", -1).limit(limit)
+        cursor = self.analyses_collection.find({}, SUMMARY_PROJECTION).sort("timestamp", -1).limit(limit)
         analyses = await cursor.to_list(length=limit)
         for analysis in analyses:
             analysis["_id"] = str(analysis["_id"])
         return analyses
 
+    # Retrieve one full analysis (including packet_details) by id
+    async def get_analysis_detail(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        """Retrieve a complete analysis document by its id."""
+        if self.analyses_collection is None:
+            return None
+        try:
+            oid = ObjectId(analysis_id)
+        except (InvalidId, TypeError):
+            return None
+        analysis = await self.analyses_collection.find_one({"_id": oid})
+        if analysis:
+            analysis["_id"] = str(analysis["_id"])
+        return analysis
+
     # Retrieve recent threats
     async def get_recent_threats(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Retrieve recent threat detections."""
@@ -149,6 +207,9 @@ class Database:
         if self.threats_collection is None:
             return []
         cursor = self.threats_collection.find({"threat_summary.overall_threat_level": "High"}).sort("timestamp", -1)
+        if self._indexes_ready:
+            # Small collections can make the planner pick a collection scan
+            cursor = cursor.hint("lvl_ts")
         threats = await cursor.to_list(length=None)
         for threat in threats:
             threat["_id"] = str(threat["_id"])
@@ -170,8 +231,9 @@ class Database:
         if self.analyses_collection is None or self.threats_collection is None:
             return {"total_analyses": 0, "total_threats": 0, "high_severity_threats": 0}
 
-        total_analyses = await self.analyses_collection.count_documents({})
-        total_threats = await self.threats_collection.count_documents({})
+        # Unfiltered totals come from collection metadata instead of a full scan
+        total_analyses = await self.analyses_collection.estimated_document_count()
+        total_threats = await self.threats_collection.estimated_document_count()
         high_threats = await self.threats_collection.count_documents({"threat_summary.overall_threat_level": "High"})
         return {
             "total_analyses": total_analyses,
@@ -184,7 +246,7 @@ class Database:
         """Close MongoDB connection."""
         if self.client:
             self.client.close()
-            print("[OK] MongoDB connection closed")
+            logger.info("MongoDB connection closed")
 
 
 _db_instance: Optional[Database] = None
@@ -3,15 +3,29 @@ PCAP analysis module.
 
 Provides a FastAPI router that accepts uploaded PCAP/PCAPNG files, performs
 lightweight analytics with Scapy, and returns structured JSON results.
+
+Captures are streamed packet by packet rather than loaded whole: with dpkt
+installed, Ethernet captures are decoded straight from the raw frames; other
+link types (or a missing dpkt) fall back to Scapy's PcapReader iterator.
+
+Parsing is CPU-bound and holds the GIL, so uploads are analyzed in a pool of
+worker processes (PCAP_WORKERS, one per CPU by default); PCAP_WORKERS=0 parses
+in a thread of the API process instead.
 """
 from __future__ import annotations
 
+import asyncio
 import logging
+import multiprocessing
 import os
+import shutil
+import socket
 import tempfile
 from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Set, Tuple
 
 from fastapi import APIRouter, File, HTTPException, UploadFile
 
@@ -20,7 +34,7 @@ from modules.pcap.database import get_database
 try:  # pragma: no cover - optional dependency
     # Import only the pieces we need to avoid Scapy auto-loading extra layers
     # (netflow/IPv6) that can break in minimal containers.
-    from scapy.utils import rdpcap  # type: ignore
+    from scapy.utils import PcapReader  # type: ignore
     from scapy.layers.dns import DNS  # type: ignore
     from scapy.layers.inet import ICMP, IP, TCP, UDP  # type: ignore
     from scapy.layers.l2 import ARP  # type: ignore
@@ -32,11 +46,26 @@ try:  # pragma: no cover - optional dependency
 except Exception as exc:  # pragma: no cover
     # Catch broad exceptions because Scapy may fail in minimal container
     # environments (e.g., missing IPv6 route metadata) with non-Import errors.
-    rdpcap = None  # type: ignore
+    PcapReader = None  # type: ignore
     DNS = ICMP = IP = TCP = UDP = ARP = PacketContainer = None  # type: ignore
     SCAPY_AVAILABLE = False
     SCAPY_IMPORT_ERROR = exc
 
+# dpkt is optional; it decodes Ethernet captures much faster than Scapy
+try:  # pragma: no cover - optional dependency
+    import dpkt  # type: ignore
+except Exception as exc:  # pragma: no cover
+    dpkt = None  # type: ignore
+    DPKT_IMPORT_ERROR = exc
+else:  # pragma: no cover
+    DPKT_IMPORT_ERROR = None
+
+PCAPNG_MAGIC = b"\x0a\x0d\x0d\x0a"
+# Well-known ports labelled in packet_details (destination port wins over source)
+_TCP_PORTS = {80: "HTTP", 443: "HTTPS", 22: "SSH"}
+_UDP_PORTS = {53: "DNS"}
+SAMPLE_SIZE = 10  # packets echoed back in packet_details
+
 
 router = APIRouter(prefix="/pcap", tags=["pcap"])
 logger = logging.getLogger(__name__)
@@ -48,6 +77,9 @@ if not SCAPY_AVAILABLE:
 _db = get_database()
 _db_ready = False
 
+# Worker processes for parsing captures; created on first upload
+_pool: Optional[ProcessPoolExecutor] = None
+
 # Basic health check endpoint
 @router.get("/health")
 def health() -> Dict[str, Any]:
@@ -86,8 +118,6 @@ async def _log_analysis(filename: str, analysis: Dict[str, Any]) -> None:
 
     # Attempt to save analysis and threat data
     try:
-        await _db.save_analysis(filename, analysis)
-
         # Summarize SYN flood findings
         syn_flood = (analysis.get("detections", {}) or {}).get("syn_flood", []) or []
         threat_level = "High" if any(alert.get("severity") == "high" for alert in syn_flood) else ("Medium" if syn_flood else "Low")
@@ -96,9 +126,10 @@ async def _log_analysis(filename: str, analysis: Dict[str, Any]) -> None:
             "syn_flood_alerts": len(syn_flood),
         }
 
-        # Save threat summary
-        await _db.save_threats(
+        # Save analysis and threat summary together
+        await _db.save_analysis_and_threats(
             filename,
+            analysis,
             {
                 "threat_summary": threat_summary,
                 "syn_flood_detection": syn_flood,
@@ -129,28 +160,15 @@ async def analyze_pcap(file: UploadFile = File(...)) -> Dict[str, Any]:
             detail="Invalid file type. Please upload a .pcap or .pcapng file.",
         )
 
-    # Save upload to a temporary file
-    tmp_path: str | None = None
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pcap") as tmp_file:
-            chunk_size = 8192
-            # Read and write in chunks to handle large files
-            while True:
-                chunk = await file.read(chunk_size)
-                if not chunk:
-                    break
-                tmp_file.write(chunk)
-            tmp_path = tmp_file.name
-
-        # Read packets with Scapy
-        packets = rdpcap(tmp_path)
-        analysis = analyze_packets(packets)
+        await file.seek(0)
+        analysis, syn_flood = await _run_analysis(file.file)
         analysis["file"] = {
             "name": file.filename,
             "size_bytes": analysis["basic_stats"]["total_bytes"],
         }
         analysis["detections"] = {
-            "syn_flood": detect_syn_flood(packets),
+            "syn_flood": syn_flood,
         }
         await _log_analysis(file.filename, analysis)
         return analysis
@@ -158,50 +176,342 @@ async def analyze_pcap(file: UploadFile = File(...)) -> Dict[str, Any]:
         raise
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"Error analyzing file: {exc}") from exc
+
+# Lazily create the analysis process pool (None = parse in a thread)
+def _analysis_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if _pool is None:
+        workers = int(os.getenv("PCAP_WORKERS") or os.cpu_count() or 1)
+        if workers <= 0:
+            return None
+        # Not fork: the API process already runs threads (Mongo monitors, log writer, to_thread
+        # workers) and a fork taken mid-flight can inherit their locks held
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+    return _pool
+
+# Stop the worker processes with the app
+def _shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+router.add_event_handler("shutdown", _shutdown_pool)
+
+# Analyze an upload off the event loop
+async def _run_analysis(upload: BinaryIO) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Return (summary, syn_flood alerts) for a seekable upload, using the process pool if enabled."""
+    global _pool
+    pool = _analysis_pool()
+    if pool is None:
+        # Parse the upload's own spooled file directly, no copy needed
+        return await asyncio.to_thread(_analyze_file, upload)
+
+    # Worker processes need a path, so spill the spooled upload to a named temp file
+    tmp_path = await asyncio.to_thread(_spill_upload, upload)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, _analyze_file, tmp_path)
+    except BrokenProcessPool as exc:
+        # A worker died (e.g. OOM-killed), possibly on this very capture: never retry it in the
+        # API process. Retire the pool (once, if several requests see it) so the next upload gets a fresh one.
+        if _pool is pool:
+            _pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+        logger.error("PCAP worker pool broke while analyzing an upload")
+        raise HTTPException(status_code=503, detail="PCAP analysis worker crashed; try again later") from exc
     finally:
-        if tmp_path and os.path.exists(tmp_path):
-            os.remove(tmp_path)
+        os.remove(tmp_path)
+
+# Copy an upload to a named temporary file
+def _spill_upload(upload: BinaryIO) -> str:
+    with tempfile.NamedTemporaryFile(suffix=".pcap", delete=False) as tmp:
+        try:
+            shutil.copyfileobj(upload, tmp, 1024 * 1024)
+        except BaseException:
+            # delete=False: nothing else would clean up the partial copy
+            tmp.close()
+            os.remove(tmp.name)
+            raise
+    return tmp.name
+
+# Full analysis of one capture; runs in a worker process (or thread)
+def _analyze_file(source: str | BinaryIO) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Return (summary, syn_flood alerts) for a capture path or seekable binary file."""
+    stats = _stream_analyze(source)
+    return stats.summary(), detect_syn_flood(stats)
+
+# Running aggregates for one capture
+class CaptureStats:
+    """Per-capture counters, fed one packet at a time by the readers below."""
+
+    def __init__(self) -> None:
+        self.total_packets = 0
+        self.total_bytes = 0
+        self.start_time = 0.0
+        self.end_time = 0.0
+        self.protocol_counter: Counter[str] = Counter()
+        self.source_counts: Counter[str] = Counter()
+        self.dest_counts: Counter[str] = Counter()
+        # SYN-without-ACK count and distinct (dst, port) targets per source, SYN-ACKs per destination
+        self.syn_counts: Counter[str] = Counter()
+        self.syn_targets: defaultdict[str, Set[Tuple[str, int]]] = defaultdict(set)
+        self.syn_ack_counts: Counter[str] = Counter()
+        # (time, source, destination, protocol name, size) of the first SAMPLE_SIZE packets
+        self.samples: List[Tuple[float, str, str, str, int]] = []
+
+    def add(
+        self,
+        ts: float,
+        size: int,
+        protocol: str,
+        src: Optional[str],
+        dst: Optional[str],
+        tcp_flags: Optional[int] = None,
+        dport: int = 0,
+    ) -> None:
+        """Count one packet. src/dst are IPv4 addresses or None; tcp_flags only for TCP over IPv4."""
+        if self.total_packets == 0:
+            self.start_time = ts
+        self.end_time = ts
+        self.total_packets += 1
+        self.total_bytes += size
+        self.protocol_counter[protocol] += 1
+
+        if src is not None:
+            self.source_counts[src] += 1
+            self.dest_counts[dst] += 1
+            if tcp_flags is not None:
+                if tcp_flags & 0x02 and not (tcp_flags & 0x10):  # SYN without ACK
+                    self.syn_counts[src] += 1
+                    self.syn_targets[src].add((dst, dport))
+                elif tcp_flags == 0x12:  # SYN-ACK
+                    self.syn_ack_counts[dst] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        """Build the basic_stats/protocol_stats/top_talkers/packet_details response."""
+        if self.total_packets == 0:
+            return {
+                "basic_stats": {
+                    "total_packets": 0,
+                    "duration": 0.0,
+                    "unique_ips": 0,
+                    "total_bytes": 0,
+                },
+                "protocol_stats": {},
+                "top_talkers": [],
+                "packet_details": [],
+            }
+
+        # Identify unique IPs and top talkers
+        all_ips = set(self.source_counts) | set(self.dest_counts)
+        top_talkers = [
+            [ip, count]
+            for ip, count in self.source_counts.most_common(5)
+        ]
+
+        # Prepare packet details (first packets of the capture)
+        packet_details: List[Dict[str, Any]] = []
+        for ts, src, dst, name, size in self.samples:
+            rel_time = round(ts - self.start_time, 3)
+            packet_details.append(
+                {
+                    "relative_time": rel_time,
+                    "time": rel_time,
+                    "source": src,
+                    "destination": dst,
+                    "protocol": name,
+                    "size_bytes": size,
+                    "size": size,
+                }
+            )
+
+        # Compile final analysis results
+        return {
+            "basic_stats": {
+                "total_packets": self.total_packets,
+                "duration": round(self.end_time - self.start_time, 2),
+                "unique_ips": len(all_ips),
+                "total_bytes": self.total_bytes,
+            },
+            "protocol_stats": dict(self.protocol_counter),
+            "top_talkers": top_talkers,
+            "packet_details": packet_details,
+        }
+
+# Stream a capture file through the fastest available reader
+def _stream_analyze(source: str | os.PathLike[str] | BinaryIO) -> CaptureStats:
+    """Aggregate a PCAP/PCAPNG capture (path or seekable binary file) in a single pass."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return _stream_analyze(f)
+
+    stats = CaptureStats()
+    if dpkt is not None and _dpkt_analyze(source, stats):
+        return stats
+    source.seek(0)
+    with PcapReader(source) as reader:
+        _scapy_analyze(reader, stats)
+    return stats
+
+# Fast path: decode Ethernet frames with dpkt
+def _dpkt_analyze(f: BinaryIO, stats: CaptureStats) -> bool:
+    """Feed every frame into stats; returns False (untouched) for non-Ethernet captures."""
+    magic = f.read(4)
+    f.seek(0)
+    reader = dpkt.pcapng.Reader(f) if magic == PCAPNG_MAGIC else dpkt.pcap.Reader(f)
+    if reader.datalink() != dpkt.pcap.DLT_EN10MB:
+        return False
+
+    IPv4, IPv6, ARPv4 = dpkt.ip.IP, dpkt.ip6.IP6, dpkt.arp.ARP
+    TCPSeg, UDPDgram, ICMPv4 = dpkt.tcp.TCP, dpkt.udp.UDP, dpkt.icmp.ICMP
+    inet_ntoa = socket.inet_ntoa
+
+    # Early-exit countdown for the packet_details sample
+    samples_left = SAMPLE_SIZE - len(stats.samples)
+    for ts, buf in _complete_records(reader):
+        fast = _parse_ipv4_frame(buf)
+        if fast is not None:
+            protocol, src, dst, sport, dport, tcp_flags = fast
+        else:
+            src = dst = None
+            tcp_flags = None
+            sport = dport = 0
+            try:
+                l3 = dpkt.ethernet.Ethernet(buf).data
+            except (dpkt.UnpackError, IndexError):
+                l3 = None
+
+            l4 = None
+            if isinstance(l3, IPv4):
+                src, dst = inet_ntoa(l3.src), inet_ntoa(l3.dst)
+                l4 = l3.data
+            elif isinstance(l3, IPv6):
+                l4 = l3.data
+
+            # Same precedence as the Scapy path: TCP, UDP, ICMP, ARP, DNS, Other
+            if isinstance(l4, TCPSeg):
+                protocol, sport, dport = "TCP", l4.sport, l4.dport
+                if src is not None:
+                    tcp_flags = l4.flags
+            elif isinstance(l4, UDPDgram):
+                protocol, sport, dport = "UDP", l4.sport, l4.dport
+            elif isinstance(l4, ICMPv4):
+                protocol = "ICMP"
+            elif isinstance(l3, ARPv4):
+                protocol = "ARP"
+            else:
+                protocol = "Other"
+
+        stats.add(float(ts), len(buf), protocol, src, dst, tcp_flags, dport)
+        if samples_left:
+            samples_left -= 1
+            name = _port_protocol(protocol, sport, dport) if protocol in ("TCP", "UDP") else protocol
+            stats.samples.append((float(ts), src or "N/A", dst or "N/A", name, len(buf)))
+    return True
+
+# Records of a dpkt reader up to the last complete one
+def _complete_records(reader: Iterable[Tuple[float, bytes]]) -> Iterable[Tuple[float, bytes]]:
+    """Stop quietly at a cut-off record (capture killed mid-write), as Scapy's PcapReader does."""
+    records = iter(reader)
+    while True:
+        try:
+            yield next(records)
+        except StopIteration:
+            return
+        except (dpkt.NeedData, dpkt.UnpackError) as exc:
+            logger.info("Capture ends in a truncated record; stopping there (%s)", exc)
+            return
+
+# Header fields of an untagged Ethernet/IPv4 frame carrying TCP or UDP, read from the raw bytes
+def _parse_ipv4_frame(buf: bytes) -> Optional[Tuple[str, str, str, int, int, Optional[int]]]:
+    """
+    Return (protocol, src, dst, sport, dport, tcp_flags) for the common case, or None
+    for anything else (ARP, IPv6, VLAN, fragments, ICMP, truncated headers) so the
+    caller falls back to the full dpkt decode, which yields the same values here.
+    """
+    if len(buf) < 34 or buf[12] != 0x08 or buf[13] != 0x00 or buf[14] >> 4 != 4:
+        return None
+    ihl = (buf[14] & 0x0F) << 2
+    l4 = 14 + ihl
+    proto = buf[23]
+    if ihl < 20 or (proto != 6 and proto != 17) or ((buf[20] << 8) | buf[21]) & 0x1FFF:
+        return None
+    # dpkt trims the payload to the IP total length (0 = segmentation offload, keep all)
+    ip_len = (buf[16] << 8) | buf[17]
+    end = min(len(buf), 14 + ip_len) if ip_len else len(buf)
+    sport = (buf[l4] << 8) | buf[l4 + 1] if end >= l4 + 2 else 0
+    dport = (buf[l4 + 2] << 8) | buf[l4 + 3] if end >= l4 + 4 else 0
+    if proto == 6:
+        # Flags are 9 bits wide (NS lives in the data-offset byte), as in dpkt and Scapy
+        if end < l4 + 20 or end < l4 + ((buf[l4 + 12] >> 4) << 2) or buf[l4 + 12] >> 4 < 5:
+            return None
+        return "TCP", socket.inet_ntoa(buf[26:30]), socket.inet_ntoa(buf[30:34]), sport, dport, ((buf[l4 + 12] & 1) << 8) | buf[l4 + 13]
+    if end < l4 + 8:
+        return None
+    return "UDP", socket.inet_ntoa(buf[26:30]), socket.inet_ntoa(buf[30:34]), sport, dport, None
+
+# Fallback: Scapy packets from any iterable (PcapReader or an in-memory list)
+def _scapy_analyze(packets: Iterable[Any], stats: CaptureStats) -> None:
+    """Feed Scapy packets into stats."""
+    samples_left = SAMPLE_SIZE - len(stats.samples)
+    for packet in packets:
+        # One walk down the layer chain, keeping the outermost layer of each class
+        layers: Dict[type, Any] = {}
+        for layer in packet.iterpayloads():
+            layers.setdefault(layer.__class__, layer)
+        tcp = layers.get(TCP)
+        udp = layers.get(UDP) if tcp is None else None
+        sport = dport = 0
+
+        # Identify protocol
+        if tcp is not None:
+            protocol, sport, dport = "TCP", int(tcp.sport), int(tcp.dport)
+        elif udp is not None:
+            protocol, sport, dport = "UDP", int(udp.sport), int(udp.dport)
+        elif ICMP in layers:
+            protocol = "ICMP"
+        elif ARP in layers:
+            protocol = "ARP"
+        elif DNS in layers:
+            protocol = "DNS"
+        else:
+            protocol = "Other"
+
+        src = dst = None
+        tcp_flags = None
+        ip = layers.get(IP)
+        if ip is not None:
+            src, dst = ip.src, ip.dst
+            if tcp is not None:
+                tcp_flags = int(tcp.flags)
+
+        ts, size = float(packet.time), len(packet)
+        stats.add(ts, size, protocol, src, dst, tcp_flags, dport)
+        if samples_left:
+            samples_left -= 1
+            # Same answer as get_protocol_name without repeating the layer walk
+            if protocol in ("TCP", "UDP"):
+                name = _port_protocol(protocol, sport, dport)
+            else:
+                name = protocol if protocol in ("ICMP", "ARP") else "Other"
+            stats.samples.append((ts, src or "N/A", dst or "N/A", name, size))
 
 # Simple SYN flood detection heuristic
-def detect_syn_flood(packets: "PacketContainer") -> List[Dict[str, Any]]:
+def detect_syn_flood(stats: CaptureStats) -> List[Dict[str, Any]]:
     """
     Very simple heuristic to highlight sources that send many SYN packets without ACKs.
+    Works on the per-source counters gathered while streaming the capture.
     Returns a list of suspicious IP summaries.
     """
-    syn_packets: defaultdict[str, List[Dict[str, Any]]] = defaultdict(list)
-    syn_ack_counts: defaultdict[str, int] = defaultdict(int)
-
-    # Analyze packets for SYN and SYN-ACK counts
-    for packet in packets:
-        if packet.haslayer(TCP) and packet.haslayer(IP):
-            flags = packet[TCP].flags
-            if flags & 0x02 and not (flags & 0x10):  # SYN without ACK
-                src_ip = packet[IP].src
-                syn_packets[src_ip].append(
-                    {
-                        "dst_ip": packet[IP].dst,
-                        "dst_port": int(packet[TCP].dport),
-                        "time": float(packet.time),
-                    }
-                )
-            elif flags == 0x12:  # SYN-ACK
-                dst_ip = packet[IP].dst
-                syn_ack_counts[dst_ip] += 1
-
-    # Identify potential SYN flood sources
     alerts: List[Dict[str, Any]] = []
     # Evaluate each source IP's SYN to SYN-ACK ratio
-    for src_ip, entries in syn_packets.items():
-        syn_count = len(entries)
-        syn_ack_count = syn_ack_counts.get(src_ip, 0)
-
-        if syn_count == 0:
-            continue
+    for src_ip, syn_count in stats.syn_counts.items():
+        syn_ack_count = stats.syn_ack_counts.get(src_ip, 0)
 
         # Calculate ratio of SYN-ACKs to SYNs
         ratio = syn_ack_count / syn_count if syn_count else 0.0
         if syn_count >= 10 and ratio < 0.2:
-            unique_targets = {f"{e['dst_ip']}:{e['dst_port']}" for e in entries}
             # Flag as suspicious if many SYNs with few SYN-ACKs
             alerts.append(
                 {
@@ -209,7 +519,7 @@ def detect_syn_flood(packets: "PacketContainer") -> List[Dict[str, Any]]:
                     "syn_count": syn_count,
                     "syn_ack_count": syn_ack_count,
                     "ack_ratio": round(ratio, 2),
-                    "unique_targets": len(unique_targets),
+                    "unique_targets": len(stats.syn_targets[src_ip]),
                     "severity": "high" if syn_count > 50 else "medium",
                 }
             )
@@ -217,89 +527,15 @@ def detect_syn_flood(packets: "PacketContainer") -> List[Dict[str, Any]]:
 
 # Analyze packets and compute statistics
 def analyze_packets(packets: "PacketContainer") -> Dict[str, Any]:
-    """Compute aggregate statistics for a packet capture."""
-    total_packets = len(packets)
-    if total_packets == 0:
-        return {
-            "basic_stats": {
-                "total_packets": 0,
-                "duration": 0.0,
-                "unique_ips": 0,
-                "total_bytes": 0,
-            },
-            "protocol_stats": {},
-            "top_talkers": [],
-            "packet_details": [],
-        }
-
-    # Compute capture duration
-    start_time = float(packets[0].time)
-    end_time = float(packets[-1].time)
-    duration = round(end_time - start_time, 2)
+    """Compute aggregate statistics for already-loaded Scapy packets."""
+    stats = CaptureStats()
+    _scapy_analyze(packets, stats)
+    return stats.summary()
 
-    # Initialize counters
-    protocol_counter: Counter[str] = Counter()
-    source_counts: Counter[str] = Counter()
-    dest_counts: Counter[str] = Counter()
-    total_bytes = 0
-
-    # Iterate through packets to gather statistics
-    for packet in packets:
-        total_bytes += len(packet)
-
-        # Identify protocol
-        if packet.haslayer(TCP):
-            protocol_counter["TCP"] += 1
-        elif packet.haslayer(UDP):
-            protocol_counter["UDP"] += 1
-        elif packet.haslayer(ICMP):
-            protocol_counter["ICMP"] += 1
-        elif packet.haslayer(ARP):
-            protocol_counter["ARP"] += 1
-        elif packet.haslayer(DNS):
-            protocol_counter["DNS"] += 1
-        else:
-            protocol_counter["Other"] += 1
-
-        if packet.haslayer(IP):
-            source_counts[packet[IP].src] += 1
-            dest_counts[packet[IP].dst] += 1
-
-    # Identify unique IPs and top talkers
-    all_ips = set(source_counts) | set(dest_counts)
-    top_talkers = [
-        [ip, count]
-        for ip, count in source_counts.most_common(5)
-    ]
-
-    # Prepare packet details (first 10 packets)
-    packet_details: List[Dict[str, Any]] = []
-    for packet in packets[:10]:
-        rel_time = round(float(packet.time) - start_time, 3)
-        packet_details.append(
-            {
-                "relative_time": rel_time,
-                "time": rel_time,
-                "source": packet[IP].src if packet.haslayer(IP) else "N/A",
-                "destination": packet[IP].dst if packet.haslayer(IP) else "N/A",
-                "protocol": get_protocol_name(packet),
-                "size_bytes": len(packet),
-                "size": len(packet),
-            }
-        )
-
-    # Compile final analysis results
-    return {
-        "basic_stats": {
-            "total_packets": total_packets,
-            "duration": duration,
-            "unique_ips": len(all_ips),
-            "total_bytes": total_bytes,
-        },
-        "protocol_stats": dict(protocol_counter),
-        "top_talkers": top_talkers,
-        "packet_details": packet_details,
-    }
+# Map transport + ports to a well-known application name
+def _port_protocol(transport: str, sport: int, dport: int) -> str:
+    ports = _TCP_PORTS if transport == "TCP" else _UDP_PORTS
+    return ports.get(dport) or ports.get(sport) or transport
 
 # Identify protocol or application from packet
 def get_protocol_name(packet) -> str:
@@ -307,23 +543,11 @@ def get_protocol_name(packet) -> str:
 
     # Check for TCP-based protocols
     if packet.haslayer(TCP):
-        sport = int(packet[TCP].sport)
-        dport = int(packet[TCP].dport)
-        if 80 in (sport, dport):
-            return "HTTP"
-        if 443 in (sport, dport):
-            return "HTTPS"
-        if 22 in (sport, dport):
-            return "SSH"
-        return "TCP"
-    
+        return _port_protocol("TCP", int(packet[TCP].sport), int(packet[TCP].dport))
+
     # Check for UDP-based protocols
     if packet.haslayer(UDP):
-        sport = int(packet[UDP].sport)
-        dport = int(packet[UDP].dport)
-        if 53 in (sport, dport):
-            return "DNS"
-        return "UDP"
+        return _port_protocol("UDP", int(packet[UDP].sport), int(packet[UDP].dport))
     if packet.haslayer(ICMP):
         return "ICMP"
     if packet.haslayer(ARP):
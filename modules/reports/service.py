@@ -1,26 +1,79 @@
 """
 Reporting module to surface recent activity across phishing, malware, and PCAP logs.
-Uses the same MongoDB connection/config as other modules.
+Uses the same MongoDB config as other modules, through the shared Motor (async) client
+so the per-collection counts and queries run concurrently.
 """
 from __future__ import annotations
 
+import asyncio
+import csv
+import io
 import logging
 from datetime import datetime, timedelta
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List
 
 from fastapi import APIRouter, HTTPException, Query
-from pymongo.collection import Collection
-from pymongo.database import Database
+from fastapi.responses import StreamingResponse
+from pymongo import DESCENDING
 
 from core.config import load_config
-from core.db.mongodb import get_db
+from core.db.mongodb import get_async_db
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/reporting", tags=["reporting"])
 
 _cfg: Dict[str, Any] = {}
-_db: Database | None = None
+_db = None  # AsyncIOMotorDatabase | None
+_indexes_ready = False
+
+# Timestamp field each kind's writer uses (phishing/malware: ts, PCAP module: timestamp)
+TIME_FIELDS: Dict[str, str] = {
+    "phishing": "ts",
+    "malware": "ts",
+    "pcap_analyses": "timestamp",
+    "pcap_threats": "timestamp",
+}
+
+# Fields the dashboard's recent-activity tables read; skips large text/packet arrays
+SUMMARY_PROJECTIONS: Dict[str, Dict[str, int]] = {
+    "phishing": {"ts": 1, "label": 1, "probability": 1, "source": 1, "subject": 1, "snippet": 1},
+    "malware": {"ts": 1, "label": 1, "probability": 1, "source": 1, "filename": 1, "sha256": 1},
+    "pcap_analyses": {"timestamp": 1, "filename": 1, "basic_stats": 1, "source": 1},
+    "pcap_threats": {"timestamp": 1, "filename": 1, "threat_summary": 1, "source": 1},
+}
+
+# CSV export columns per kind, matching the documents each module writes
+SCHEMAS: Dict[str, List[str]] = {
+    "phishing": [
+        "_id", "ts", "label", "probability", "threshold", "subject", "body",
+        "raw_present", "text_sha256", "snippet", "source",
+    ],
+    "malware": [
+        "_id", "ts", "label", "probability", "threshold", "sha256", "size",
+        "indicators", "features", "filename", "content_type", "source",
+    ],
+    "pcap_analyses": [
+        "_id", "timestamp", "filename", "basic_stats", "protocol_stats",
+        "top_talkers", "packet_details", "source",
+    ],
+    "pcap_threats": [
+        "_id", "timestamp", "filename", "threat_summary", "syn_flood_detection",
+        "port_scan_detection", "volume_anomaly_detection", "abuseipdb_results", "source",
+    ],
+}
+DATETIME_FIELDS = ("ts", "timestamp")
+EXPORT_BATCH = 500
+
+
+def _csv_header(fieldnames: List[str]) -> bytes:
+    buf = io.StringIO()
+    csv.writer(buf).writerow(fieldnames)
+    return buf.getvalue().encode("utf-8")
+
+
+# Header line per kind, rendered once; schemas are static so exports skip writeheader()
+CSV_HEADERS: Dict[str, bytes] = {kind: _csv_header(fields) for kind, fields in SCHEMAS.items()}
 
 
 def _load_db() -> None:
@@ -28,13 +81,38 @@ def _load_db() -> None:
     global _cfg, _db
     _cfg = load_config()
     try:
-        _db = get_db(_cfg)
+        _db = get_async_db(_cfg)
     except Exception as exc:
         logger.warning("Reporting Mongo unavailable: %s", exc)
         _db = None
 
 
-def _col(name: str) -> Collection | None:
+def _collection_names() -> Dict[str, str]:
+    """Collection name per report kind, honouring the modules' logging config."""
+    return {
+        "phishing": (_cfg.get("phishing", {}).get("logging", {}) or {}).get("collection_predictions", "predictions"),
+        "malware": (_cfg.get("malware", {}).get("logging", {}) or {}).get("collection_scans", "malware"),
+        "pcap_analyses": "analyses",
+        "pcap_threats": "threats",
+    }
+
+
+async def _ensure_indexes() -> None:
+    """Create the descending time index each kind sorts on (once; Mongo skips existing ones)."""
+    global _indexes_ready
+    if _indexes_ready or _db is None:
+        return
+    try:
+        await asyncio.gather(*(
+            _db[name].create_index([(TIME_FIELDS[kind], DESCENDING)])
+            for kind, name in _collection_names().items()
+        ))
+        _indexes_ready = True
+    except Exception as exc:
+        logger.warning("Reporting indexes not created: %s", exc)
+
+
+def _col(name: str):
     if _db is None:
         return None
     try:
@@ -43,43 +121,63 @@ def _col(name: str) -> Collection | None:
         return None
 
 
-def _count(col: Collection | None) -> int:
+async def _count(col) -> int:
+    """Unfiltered total from collection metadata (no scan); use count_documents for filters."""
     if col is None:
         return 0
     try:
-        return col.count_documents({})
+        return await col.estimated_document_count()
     except Exception:
         return 0
 
 
-def _recent(col: Collection | None, limit: int = 5) -> List[Dict[str, Any]]:
-    return _query(col, limit=limit)
+async def _recent(col, limit: int = 5) -> List[Dict[str, Any]]:
+    return await _query(col, limit=limit)
 
 
-def _query(
-    col: Collection | None,
+def _find(
+    col,
     limit: int = 5,
     from_dt: datetime | None = None,
     to_dt: datetime | None = None,
+    time_field: str | None = None,
+    projection: Dict[str, int] | None = None,
+):
+    """
+    Newest-first cursor over col, optionally bounded by a date range.
+    With time_field the filter and sort use that single (indexed) field; without it
+    both ts and timestamp are tried, which Mongo cannot serve from one index.
+    """
+    fields = (time_field,) if time_field else ("ts", "timestamp")
+    query: Dict[str, Any] = {}
+    if from_dt or to_dt:
+        lt_dt = to_dt + timedelta(days=1) if to_dt else None
+        clauses: List[Dict[str, Any]] = []
+        for field in fields:
+            clause: Dict[str, Any] = {}
+            if from_dt:
+                clause["$gte"] = from_dt
+            if lt_dt:
+                clause["$lt"] = lt_dt  # inclusive of the selected "to" date
+            clauses.append({field: clause})
+        query = clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+    cursor = col.find(query or None, projection)
+    return cursor.sort([(field, DESCENDING) for field in fields]).limit(limit)
+
+
+async def _query(
+    col,
+    limit: int = 5,
+    from_dt: datetime | None = None,
+    to_dt: datetime | None = None,
+    time_field: str | None = None,
+    projection: Dict[str, int] | None = None,
 ) -> List[Dict[str, Any]]:
     if col is None:
         return []
     try:
-        query: Dict[str, Any] = {}
-        if from_dt or to_dt:
-            lt_dt = to_dt + timedelta(days=1) if to_dt else None
-            clauses: List[Dict[str, Any]] = []
-            for field in ("ts", "timestamp"):
-                clause: Dict[str, Any] = {}
-                if from_dt:
-                    clause["$gte"] = from_dt
-                if lt_dt:
-                    clause["$lt"] = lt_dt  # inclusive of the selected "to" date
-                clauses.append({field: clause})
-            query = {"$or": clauses}
-
-        cursor = col.find(query or None).sort([("ts", -1), ("timestamp", -1)]).limit(limit)
-        docs = list(cursor)
+        docs = await _find(col, limit, from_dt, to_dt, time_field, projection).to_list(length=limit)
     except Exception:
         return []
 
@@ -92,6 +190,31 @@ def _query(
     return docs
 
 
+async def _csv_stream(cursor, kind: str) -> AsyncIterator[str | bytes]:
+    """Yield the kind's CSV header, then rows in EXPORT_BATCH-row chunks; memory stays flat regardless of limit."""
+    yield CSV_HEADERS[kind]
+    if cursor is None:
+        return
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=SCHEMAS[kind], extrasaction="ignore")
+    try:
+        n = 0
+        async for doc in cursor:
+            n += 1
+            for field in DATETIME_FIELDS:
+                value = doc.get(field)
+                if isinstance(value, datetime):
+                    doc[field] = value.isoformat()
+            writer.writerow(doc)
+            if n % EXPORT_BATCH == 0:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+    except Exception:
+        logger.exception("CSV export interrupted")
+    yield buf.getvalue()
+
+
 @router.get("/health")
 def health() -> Dict[str, Any]:
     """Basic readiness for reporting module."""
@@ -101,17 +224,12 @@ def health() -> Dict[str, Any]:
         "mongodb_enabled": bool(_cfg.get("mongodb", {}).get("enabled", False)),
         "mongodb_connected": ok,
         "database": (_cfg.get("mongodb", {}) or {}).get("database"),
-        "collections": {
-            "phishing": (_cfg.get("phishing", {}).get("logging", {}) or {}).get("collection_predictions", "predictions"),
-            "malware": (_cfg.get("malware", {}).get("logging", {}) or {}).get("collection_scans", "malware"),
-            "pcap_analyses": "analyses",
-            "pcap_threats": "threats",
-        },
+        "collections": _collection_names(),
     }
 
 
 @router.get("/summary")
-def summary(
+async def summary(
     limit: int = Query(5, ge=1, le=100),
     from_ts: datetime | None = Query(None),
     to_ts: datetime | None = Query(None),
@@ -120,29 +238,32 @@ def summary(
     if _db is None:
         raise HTTPException(status_code=503, detail="MongoDB not connected for reporting")
 
-    phish_col = _col((_cfg.get("phishing", {}).get("logging", {}) or {}).get("collection_predictions", "predictions"))
-    malware_col = _col((_cfg.get("malware", {}).get("logging", {}) or {}).get("collection_scans", "malware"))
-    pcap_analyses_col = _col("analyses")
-    pcap_threats_col = _col("threats")
+    await _ensure_indexes()
+    kinds = list(_collection_names().items())
+    cols = [_col(name) for _, name in kinds]
+
+    # All counts and queries in flight at once: one round-trip of latency instead of eight
+    results = await asyncio.gather(
+        *(_count(col) for col in cols),
+        *(
+            _query(
+                col, limit=limit, from_dt=from_ts, to_dt=to_ts,
+                time_field=TIME_FIELDS[kind], projection=SUMMARY_PROJECTIONS[kind],
+            )
+            for (kind, _), col in zip(kinds, cols)
+        ),
+    )
+    counts, recent = results[:len(cols)], results[len(cols):]
+    keys = ("phishing_predictions", "malware_scans", "pcap_analyses", "pcap_threats")
 
     return {
-        "counts": {
-            "phishing_predictions": _count(phish_col),
-            "malware_scans": _count(malware_col),
-            "pcap_analyses": _count(pcap_analyses_col),
-            "pcap_threats": _count(pcap_threats_col),
-        },
-        "recent": {
-            "phishing_predictions": _query(phish_col, limit=limit, from_dt=from_ts, to_dt=to_ts),
-            "malware_scans": _query(malware_col, limit=limit, from_dt=from_ts, to_dt=to_ts),
-            "pcap_analyses": _query(pcap_analyses_col, limit=limit, from_dt=from_ts, to_dt=to_ts),
-            "pcap_threats": _query(pcap_threats_col, limit=limit, from_dt=from_ts, to_dt=to_ts),
-        },
+        "counts": dict(zip(keys, counts)),
+        "recent": dict(zip(keys, recent)),
     }
 
 
 @router.get("/export")
-def export(
+async def export(
     kind: str,
     format: str = Query("json", pattern="^(json|csv)$"),
     from_ts: datetime | None = Query(None),
@@ -153,40 +274,32 @@ def export(
     if _db is None:
         raise HTTPException(status_code=503, detail="MongoDB not connected for reporting")
 
-    mapping = {
-        "phishing": (_cfg.get("phishing", {}).get("logging", {}) or {}).get("collection_predictions", "predictions"),
-        "malware": (_cfg.get("malware", {}).get("logging", {}) or {}).get("collection_scans", "malware"),
-        "pcap_analyses": "analyses",
-        "pcap_threats": "threats",
-    }
-    col_name = mapping.get(kind)
+    col_name = _collection_names().get(kind)
     if not col_name:
         raise HTTPException(status_code=400, detail="Unknown kind")
 
+    await _ensure_indexes()
     col = _col(col_name)
-    rows = _query(col, limit=limit, from_dt=from_ts, to_dt=to_ts)
+    time_field = TIME_FIELDS[kind]
 
     if format == "json":
+        rows = await _query(col, limit=limit, from_dt=from_ts, to_dt=to_ts, time_field=time_field)
         return {"kind": kind, "count": len(rows), "data": rows}
 
-    # CSV export
-    import csv
-    import io
-
-    # Handle empty result set
-    if not rows:
-        return {"kind": kind, "count": 0, "data": ""}
-
-    # Determine all fieldnames across rows
-    fieldnames = sorted({k for row in rows for k in row.keys()})
-    buf = io.StringIO()
-    writer = csv.DictWriter(buf, fieldnames=fieldnames)
-    writer.writeheader()
-    
-    # Write rows
-    for row in rows:
-        writer.writerow(row)
-    return buf.getvalue()
+    # CSV export: stream the cursor in batches instead of building the file in memory
+    docs = None
+    if col is not None:
+        try:
+            docs = _find(
+                col, limit=limit, from_dt=from_ts, to_dt=to_ts, time_field=time_field
+            ).batch_size(EXPORT_BATCH)
+        except Exception:
+            logger.exception("CSV export query failed")
+    return StreamingResponse(
+        _csv_stream(docs, kind),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{kind}.csv"'},
+    )
 
 
 # Initialize on import
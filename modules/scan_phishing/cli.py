@@ -36,11 +36,19 @@ def main(argv=None):
 
     if args.cmd == "predict":
         text = None
+        encoded = None  # utf-8 bytes of text, when already at hand
         if args.text:
             text = args.text
         elif args.file:
-            with open(args.file, "r", encoding="utf-8", errors="ignore") as f:
-                text = f.read()
+            with open(args.file, "rb") as f:
+                encoded = f.read()
+            try:
+                text = encoded.decode("utf-8")
+            except UnicodeDecodeError:
+                text, encoded = encoded.decode("utf-8", errors="ignore"), None
+            # Same newline translation as reading in text mode
+            if "\r" in text:
+                text, encoded = text.replace("\r\n", "\n").replace("\r", "\n"), None
         else:
             print("Provide --text or --file", file=sys.stderr)
             sys.exit(1)
@@ -48,7 +56,7 @@ def main(argv=None):
         pcfg = cfg["phishing"]
         pipe = load_artifacts(pcfg["artifacts_dir"])
         X = pipe["featurizer"].transform([text])
-        prob = float(pipe["clf"].predict_proba(X)[0,1])
+        prob = float(pipe["score"](X)[0])
         label = int(prob >= pcfg.get("threshold", 0.5))
         print({"label": label, "probability": prob})
 
@@ -66,7 +74,10 @@ def main(argv=None):
                         "label": label,
                         "probability": prob,
                         "threshold": float(pcfg.get("threshold", 0.5)),
-                        "text_sha256": hashlib.sha256((text or "").encode("utf-8", errors="ignore")).hexdigest(),
+                        # Valid UTF-8 files are hashed from the bytes read, without re-encoding
+                        "text_sha256": hashlib.sha256(
+                            encoded if encoded is not None else (text or "").encode("utf-8", errors="ignore")
+                        ).hexdigest(),
                         "snippet": snippet,
                         "source": "cli/phishing"
                     })
@@ -1,13 +1,65 @@
-import re, numpy as np
+import json, os, re, threading, numpy as np
+from functools import partial
 from scipy.sparse import csr_matrix, hstack
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer, TfidfVectorizer
+from sklearn.pipeline import Pipeline
 
 TAG_RE = re.compile(r"<[^>]+>")
 URL_RE = re.compile(r"https?://[^\s)>\"]+", re.I)
+LOGIN_RE = re.compile(r"(login|verify|update|reset)", re.I)
+IPV4_HOST_RE = re.compile(r"\d+\.\d+\.\d+\.\d+")
+
+# hyperscan is optional; it answers "any URL?" / "any login word?" in one pass per text
+try:
+    import hyperscan
+except Exception as exc:  # pragma: no cover - optional dependency
+    hyperscan = None  # type: ignore
+    HYPERSCAN_IMPORT_ERROR = exc
+else:  # pragma: no cover
+    HYPERSCAN_IMPORT_ERROR = None
+
+_HAS_URL, _HAS_LOGIN = 1, 2
+_HS_DB = None
+_HS_LOCAL = threading.local()  # scratch space is per thread
+if hyperscan is not None:
+    try:
+        _HS_DB = hyperscan.Database()
+        # ASCII-caseless equivalents of URL_RE's scheme and LOGIN_RE
+        _HS_DB.compile(
+            expressions=[rb"https?://", rb"login|verify|update|reset"],
+            ids=[_HAS_URL, _HAS_LOGIN],
+            flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH] * 2,
+        )
+    except Exception:  # pragma: no cover - e.g. CPU without SSSE3
+        _HS_DB = None
+
+# numba is optional; it compiles the URL-feature loop for ASCII texts
+try:
+    from numba import njit, prange
+except Exception as exc:  # pragma: no cover - optional dependency
+    njit = prange = None  # type: ignore
+    NUMBA_IMPORT_ERROR = exc
+else:  # pragma: no cover
+    NUMBA_IMPORT_ERROR = None
 
 # Utility functions
-def _strip_html(x: str) -> str:
-    return TAG_RE.sub(" ", x or "")
+# Produce path via write(tmp) + rename, so a reader (or a live mmap of the old file) never sees a partial file
+def write_atomic(path, write) -> None:
+    path = os.fspath(path)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+_STRIP_TAGS = partial(TAG_RE.sub, " ")
+
+# Strip tags from a str; a text without "<" has none, and the find is much cheaper than the regex scan
+def _strip_tags(x: str) -> str:
+    return _STRIP_TAGS(x) if "<" in x else x
 
 #   Normalize input texts to a 1-D numpy array of strings
 def _normalize_texts(X) -> np.ndarray:
@@ -16,6 +68,12 @@ def _normalize_texts(X) -> np.ndarray:
     Accepts pandas objects, numpy arrays, sequences, and scalars.
     """
 
+    # Fast paths: a str, or a list of str (the predict paths), need no per-item conversion
+    if type(X) is str:
+        return np.array([X], dtype=object)
+    if type(X) is list and all(type(x) is str for x in X):
+        return np.asarray(X, dtype=object)
+
     # Handle scalar inputs
     if isinstance(X, (str, bytes)):
         arr = np.array([X], dtype=object)
@@ -42,33 +100,201 @@ def _normalize_texts(X) -> np.ndarray:
             normalized.append(str(raw))
     return np.asarray(normalized, dtype=object)
 
+# Bitmask of _HAS_URL / _HAS_LOGIN for an ASCII text, via hyperscan
+def _hs_flags(txt: str) -> int:
+    scratch = getattr(_HS_LOCAL, "scratch", None)
+    if scratch is None:
+        scratch = _HS_LOCAL.scratch = hyperscan.Scratch(_HS_DB)
+    found = [0]
+
+    def on_match(pattern_id, start, end, flags, context):
+        found[0] |= pattern_id
+
+    _HS_DB.scan(txt.encode("ascii"), match_event_handler=on_match, scratch=scratch)
+    return found[0]
+
+# Compiled URL features over a flat ASCII buffer (texts[d] = buf[offsets[d]:offsets[d + 1]])
+if njit is not None:
+
+    @njit(cache=True, inline="always")
+    def _lower(c):
+        return c | 0x20 if 65 <= c <= 90 else c
+
+    # Characters that end a URL_RE match: ASCII \s (as Python's str \s sees it), ')', '>', '"'
+    @njit(cache=True, inline="always")
+    def _url_stop(c):
+        return c == 32 or 9 <= c <= 13 or 28 <= c <= 31 or c == 41 or c == 62 or c == 34
+
+    # Caseless comparison of buf[i:] with words[w] (lowercase, length in column 7)
+    @njit(cache=True)
+    def _at(buf, i, end, words, w):
+        n = words[w, 7]
+        if i + n > end:
+            return False
+        for k in range(1, n):
+            if _lower(buf[i + k]) != words[w, k]:
+                return False
+        return True
+
+    # IPV4_HOST_RE.match on buf[i:end]
+    @njit(cache=True)
+    def _ipv4_prefix(buf, i, end):
+        for group in range(4):
+            if group:
+                if i >= end or buf[i] != 46:
+                    return False
+                i += 1
+            if i >= end or not 48 <= buf[i] <= 57:
+                return False
+            while i < end and 48 <= buf[i] <= 57:
+                i += 1
+        return True
+
+    # Caseless equality of two host spans
+    @njit(cache=True)
+    def _same_host(buf, a, b, n):
+        for k in range(n):
+            if _lower(buf[a + k]) != _lower(buf[b + k]):
+                return False
+        return True
+
+    @njit(cache=True, parallel=True)
+    def _url_kernel(buf, offsets, out, words, first):
+        for d in prange(offsets.shape[0] - 1):
+            start, end = offsets[d], offsets[d + 1]
+            host_start = np.empty((end - start) // 8 + 1, dtype=np.int64)
+            host_len = np.empty_like(host_start)
+            n_urls = n_hosts = 0
+            has_ip = False
+            login = False
+
+            i = start
+            while i < end:
+                # first[c] = 1 + row in words for bytes that can start a login word or "http"
+                w = first[buf[i]] - 1
+                if w < 0 or (login and w < 4):
+                    i += 1
+                    continue
+                if w < 4:
+                    if _at(buf, i, end, words, w):
+                        login = True
+                    i += 1
+                    continue
+                # https?:// followed by at least one non-stop character, as URL_RE
+                if _at(buf, i, end, words, 4):
+                    j = i + 4
+                    if j < end and _lower(buf[j]) == 115:
+                        j += 1
+                    if j + 3 < end and buf[j] == 58 and buf[j + 1] == 47 and buf[j + 2] == 47 and not _url_stop(buf[j + 3]):
+                        h = j + 3
+                        k = h
+                        hend = -1
+                        while k < end and not _url_stop(buf[k]):
+                            if hend < 0 and buf[k] == 47:
+                                hend = k
+                            k += 1
+                        n = (hend if hend >= 0 else k) - h
+                        seen = False
+                        for u in range(n_hosts):
+                            if host_len[u] == n and _same_host(buf, host_start[u], h, n):
+                                seen = True
+                                break
+                        if not seen:
+                            host_start[n_hosts], host_len[n_hosts] = h, n
+                            n_hosts += 1
+                            if not has_ip and _ipv4_prefix(buf, h, h + n):
+                                has_ip = True
+                        n_urls += 1
+                        # The login words cannot straddle a URL boundary, so scan inside it too
+                        while i < k and not login:
+                            w = first[buf[i]] - 1
+                            if 0 <= w < 4 and _at(buf, i, end, words, w):
+                                login = True
+                            i += 1
+                        i = k
+                        continue
+                i += 1
+
+            out[d, 0] = n_urls
+            out[d, 1] = n_hosts
+            out[d, 2] = 1.0 if login else 0.0
+            out[d, 3] = 1.0 if has_ip else 0.0
+else:
+    _url_kernel = None
+
+# Login words (rows 0-3) and "http" (row 4) for _url_kernel; column 7 holds the length,
+# and a first-byte table (either case) mapping to row + 1
+_KERNEL_WORDS = np.zeros((5, 8), dtype=np.uint8)
+_KERNEL_FIRST = np.zeros(256, dtype=np.uint8)
+_KERNEL_MIN_ROWS = 256
+for _row, _word in enumerate((b"login", b"verify", b"update", b"reset", b"http")):
+    _KERNEL_WORDS[_row, :len(_word)] = np.frombuffer(_word, dtype=np.uint8)
+    _KERNEL_WORDS[_row, 7] = len(_word)
+    _KERNEL_FIRST[_word[0]] = _KERNEL_FIRST[_word[0] - 32] = _row + 1
+
+# Fill out[rows] with kernel features for ASCII texts
+def _kernel_features(texts, rows, out: np.ndarray) -> None:
+    encoded = [texts[i].encode("ascii") for i in rows]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    buf = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    block = np.zeros((len(rows), 4), dtype=np.float32)
+    _url_kernel(buf, offsets, block, _KERNEL_WORDS, _KERNEL_FIRST)
+    out[rows] = block
+
 # URL-derived feature extractor
 class UrlFeatures:
     def fit(self, X, y=None): return self
     def transform(self, X):
+        return csr_matrix(self.dense(X))
+
+    # The 4 URL features per text as a dense float32 (n, 4) array
+    def dense(self, X) -> np.ndarray:
         arr = _normalize_texts(X)
-        rows = []
+        # One preallocated block; empty input still yields the expected 4 columns
+        features = np.zeros((int(arr.size), 4), dtype=np.float32)
+        find_urls, find_login, match_ip = URL_RE.findall, LOGIN_RE.search, IPV4_HOST_RE.match
+
+        rows = range(int(arr.size))
+        if _url_kernel is not None:
+            # ASCII texts go through the compiled kernel; the rest take the loop below
+            ascii_rows, rows = [], []
+            for i, txt in enumerate(arr):
+                (ascii_rows if txt.isascii() else rows).append(i)
+            # Small batches wait for a big one to pay the compile (a few seconds, then cached on disk)
+            if len(ascii_rows) >= _KERNEL_MIN_ROWS or (ascii_rows and _url_kernel.signatures):
+                _kernel_features(arr, ascii_rows, features)
+            else:
+                rows = range(int(arr.size))
 
         # Extract URL-based features for each text
-        for raw in arr:
-            txt = raw
-            urls = URL_RE.findall(txt) if txt else []
-            hosts = [u.split("://",1)[-1].split("/",1)[0].lower() for u in urls]
-            url_count = float(len(urls))
-            unique_domains = float(len(set(hosts)))
-            has_login = 1.0 if re.search(r"(login|verify|update|reset)", txt, re.I) else 0.0
-            has_ip = 1.0 if any(re.match(r"\d+\.\d+\.\d+\.\d+", h) for h in hosts) else 0.0
-            rows.append([url_count, unique_domains, has_login, has_ip])
-        
-        # Convert to sparse matrix
-        if rows:
-            features = np.asarray(rows, dtype=np.float32)
-
-        # Handle empty input case    
-        else:
-            # Preserve expected column count even when the input is empty.
-            features = np.zeros((int(arr.size), 4), dtype=np.float32)
-        return csr_matrix(features)
+        for i in rows:
+            txt = arr[i]
+            if not txt:
+                continue
+            login = None
+            if _HS_DB is not None and txt.isascii():
+                # Unicode case folding (e.g. U+017F for "s") keeps non-ASCII texts on re
+                flags = _hs_flags(txt)
+                login = bool(flags & _HAS_LOGIN)
+                if not flags & _HAS_URL:
+                    features[i, 2] = 1.0 if login else 0.0
+                    continue
+            urls = find_urls(txt)
+            # URL_RE guarantees a scheme, so partition is enough to isolate the host
+            hosts = {u.partition("://")[2].partition("/")[0].lower() for u in urls}
+            if login is None:
+                login = find_login(txt) is not None
+            features[i] = (
+                len(urls),
+                len(hosts),
+                1.0 if login else 0.0,
+                1.0 if any(match_ip(h) for h in hosts) else 0.0,
+            )
+        return features
+
+# UrlFeatures is stateless; share one instance instead of building one per call
+_URL_FEATURES = UrlFeatures()
 
 # Text featurizer with optional URL features
 class TextURLFeaturizer:
@@ -76,6 +302,11 @@ class TextURLFeaturizer:
     TfidfVectorizer wrapper that optionally augments text features with URL-derived features.
     Stored attributes align with historical joblib artifacts: vectorizer, lowercase,
     strip_html, include_url_features.
+
+    With use_hashing=True the vectorizer is HashingVectorizer + TfidfTransformer instead:
+    no vocabulary dict to build or unpickle, vocab_size hashed columns, and only the idf
+    vector is learned. min_df/max_df do not apply in that mode, and the hashed columns
+    differ from a vocabulary fit, so the model must be retrained after switching.
     """
 
     # Initialization
@@ -88,6 +319,7 @@ class TextURLFeaturizer:
         lowercase: bool = True,
         strip_html: bool = True,
         include_url_features: bool = True,
+        use_hashing: bool = False,
     ):
            # Store parameters 
         self.vocab_size = vocab_size
@@ -97,12 +329,23 @@ class TextURLFeaturizer:
         self.lowercase = lowercase
         self.strip_html = strip_html
         self.include_url_features = include_url_features
+        self.use_hashing = use_hashing
         self.vectorizer = self._create_vectorizer()
         self.expected_total_features = None
 
-    # Create the TfidfVectorizer with specified parameters
-    def _create_vectorizer(self) -> TfidfVectorizer:
+    # Create the TfidfVectorizer (or hashing pipeline) with specified parameters
+    def _create_vectorizer(self):
         max_features = self.vocab_size if (self.vocab_size and self.vocab_size > 0) else None
+        if getattr(self, "use_hashing", False):
+            hasher = HashingVectorizer(
+                n_features=max_features or 2 ** 20,
+                ngram_range=self.ngram_range,
+                lowercase=self.lowercase,
+                alternate_sign=False,
+                norm=None,  # TfidfTransformer normalizes after idf weighting
+                dtype=np.float32,
+            )
+            return Pipeline([("hash", hasher), ("tfidf", TfidfTransformer())])
         return TfidfVectorizer(
             max_features=max_features,
             ngram_range=self.ngram_range,
@@ -116,23 +359,35 @@ class TextURLFeaturizer:
     def _preprocess(self, texts: np.ndarray) -> np.ndarray:
         if not self.strip_html:
             return texts
-        return np.asarray([_strip_html(t) for t in texts], dtype=object)
+        # Texts are already normalized to str, so no None guard is needed
+        return np.asarray(list(map(_strip_tags, texts)), dtype=object)
+
+    # Number of text columns the fitted vectorizer produces
+    def _text_dims(self) -> int:
+        if getattr(self, "use_hashing", False):
+            return self.vectorizer.named_steps["hash"].n_features
+        return len(getattr(self.vectorizer, "vocabulary_", {}) or {})
 
     # Fit, transform, and fit_transform methods
     def fit(self, X, y=None):
         texts = _normalize_texts(X)
         processed = self._preprocess(texts)
+        self._one_row = None
         self.vectorizer.fit(processed, y)
-        self.expected_total_features = len(self.vectorizer.vocabulary_) + (4 if self.include_url_features else 0)
+        self.expected_total_features = self._text_dims() + (4 if self.include_url_features else 0)
         return self
 
     # Transform method
     def transform(self, X):
         texts = _normalize_texts(X)
+        if texts.size == 1:
+            row = self._transform_one(texts[0])
+            if row is not None:
+                return row
         processed = self._preprocess(texts)
         X_tfidf = self.vectorizer.transform(processed)
         if self.include_url_features:
-            X_url = UrlFeatures().transform(texts)
+            X_url = _URL_FEATURES.transform(texts)
             X_combined = hstack([X_tfidf, X_url], format="csr")
         else:
             X_combined = X_tfidf
@@ -152,15 +407,81 @@ class TextURLFeaturizer:
                 X_combined = X_combined[:, :expected]
         return X_combined
 
+    # What _transform_one needs from the fitted TfidfVectorizer, or None if it does not apply
+    def _one_row_parts(self):
+        parts = self.__dict__.get("_one_row")
+        if parts is None:
+            vec = self.vectorizer
+            if (
+                getattr(self, "use_hashing", False)
+                or not isinstance(vec, TfidfVectorizer)
+                or vec.input != "content"
+                or vec.norm not in ("l2", None)
+                or not hasattr(vec, "vocabulary_")
+            ):
+                parts = False
+            else:
+                idf = vec.idf_.astype(np.float32) if vec.use_idf else None
+                parts = (vec.build_analyzer(), vec.vocabulary_, idf, vec.binary, vec.sublinear_tf, vec.norm)
+            self._one_row = parts
+        return parts or None
+
+    # One text straight to its CSR row: the vectorizer's own analyzer, a vocabulary lookup
+    # and the tf-idf arithmetic, without sklearn's per-call validation and sparse stacking
+    def _transform_one(self, text: str):
+        parts = self._one_row_parts()
+        if parts is None:
+            return None
+        analyzer, vocabulary, idf, binary, sublinear_tf, norm = parts
+
+        counts: dict = {}
+        for token in analyzer(_strip_tags(text) if self.strip_html else text):
+            col = vocabulary.get(token)
+            if col is not None:
+                counts[col] = counts.get(col, 0) + 1
+        cols = sorted(counts)
+        indices = np.array(cols, dtype=np.int32)
+        data = np.ones(len(cols), dtype=np.float32) if binary else np.array(
+            [counts[c] for c in cols], dtype=np.float32
+        )
+        if sublinear_tf:
+            np.log(data, out=data)
+            data += 1
+        if idf is not None:
+            data *= idf[indices]
+        if norm == "l2" and len(data):
+            length = np.sqrt(np.dot(data, data))
+            if length > 0:
+                data /= length
+
+        n_cols = len(vocabulary)
+        if self.include_url_features:
+            url = _URL_FEATURES.dense([text])[0]
+            url_cols = np.flatnonzero(url)
+            indices = np.concatenate([indices, (n_cols + url_cols).astype(np.int32)])
+            data = np.concatenate([data, url[url_cols]])
+            n_cols += 4
+
+        # Same padding/truncation as transform
+        expected = getattr(self, "expected_total_features", None)
+        if expected is not None and expected != n_cols:
+            if expected < n_cols:
+                keep = indices < expected
+                indices, data = indices[keep], data[keep]
+            n_cols = expected
+        indptr = np.array([0, len(indices)], dtype=np.int32)
+        return csr_matrix((data, indices, indptr), shape=(1, n_cols))
+
     # Fit_transform method
     def fit_transform(self, X, y=None):
         texts = _normalize_texts(X)
         processed = self._preprocess(texts)
+        self._one_row = None
         X_tfidf = self.vectorizer.fit_transform(processed, y)
 
         # Combine with URL features if enabled
         if self.include_url_features:
-            X_url = UrlFeatures().transform(texts)
+            X_url = _URL_FEATURES.transform(texts)
             X_combined = hstack([X_tfidf, X_url], format="csr")
 
         #   Otherwise, use only text features    
@@ -183,13 +504,63 @@ class TextURLFeaturizer:
                 X_combined = X_combined[:, :expected]
         return X_combined
 
+    # Constructor params (plus the fitted feature count) stored alongside the arrays
+    _NPZ_PARAMS = (
+        "vocab_size", "ngram_range", "min_df", "max_df", "lowercase",
+        "strip_html", "include_url_features", "use_hashing", "expected_total_features",
+    )
+
+    # Plain-array persistence: no pickled vocabulary dict to rebuild object by object
+    def save_npz(self, path) -> None:
+        """Write params, vocabulary terms (in column order) and idf weights to an .npz file."""
+        params = {name: getattr(self, name, None) for name in self._NPZ_PARAMS}
+        if params["expected_total_features"] is not None:
+            params["expected_total_features"] = int(params["expected_total_features"])
+        if getattr(self, "use_hashing", False):
+            terms = np.array([], dtype=str)
+            idf = self.vectorizer.named_steps["tfidf"].idf_
+        else:
+            ordered = [""] * len(self.vectorizer.vocabulary_)
+            for term, col in self.vectorizer.vocabulary_.items():
+                ordered[col] = term
+            terms = np.array(ordered, dtype=str)
+            idf = self.vectorizer.idf_
+
+        def write(tmp):
+            with open(tmp, "wb") as fh:  # a file object keeps savez from appending ".npz"
+                np.savez_compressed(fh, params=np.array(json.dumps(params)), terms=terms, idf=idf)
+        write_atomic(path, write)
+
+    # Rebuild a fitted featurizer from save_npz output
+    @classmethod
+    def load_npz(cls, path) -> "TextURLFeaturizer":
+        with np.load(path, allow_pickle=False) as data:
+            params = json.loads(str(data["params"]))
+            terms, idf = data["terms"], data["idf"]
+        expected = params.pop("expected_total_features")
+        params["ngram_range"] = tuple(params["ngram_range"])
+        featurizer = cls(**params)
+        if featurizer.use_hashing:
+            featurizer.vectorizer.named_steps["tfidf"].idf_ = idf
+        else:
+            # vocabulary_ first: the idf_ setter checks the lengths match
+            featurizer.vectorizer.vocabulary_ = dict(zip(terms.tolist(), range(len(terms))))
+            featurizer.vectorizer.idf_ = idf
+        featurizer.expected_total_features = expected
+        return featurizer
+
     # Joblib backward compatibility: ensure vectorizer exists after unpickling older objects.
     def __getstate__(self):
-        return self.__dict__
+        # The single-row cache holds the analyzer closure; it is rebuilt on first use
+        state = dict(self.__dict__)
+        state.pop("_one_row", None)
+        return state
 
     # Restore state and ensure vectorizer and expected feature count are set
     def __setstate__(self, state):
         self.__dict__.update(state)
+        # Artifacts saved before use_hashing existed are vocabulary-based
+        self.__dict__.setdefault("use_hashing", False)
 
         # Ensure vectorizer and expected feature count are initialized
         if "vectorizer" not in self.__dict__ or self.vectorizer is None:
@@ -197,9 +568,8 @@ class TextURLFeaturizer:
 
         # Ensure expected feature count is set    
         if "expected_total_features" not in self.__dict__ or self.expected_total_features is None:
-            vocab = len(getattr(self.vectorizer, "vocabulary_", {}) or {})
             url_dims = 4 if self.include_url_features else 0
-            self.expected_total_features = vocab + url_dims
+            self.expected_total_features = self._text_dims() + url_dims
 
 # Factory function to build featurizer based on config
 def build_featurizer(pcfg):
@@ -210,6 +580,7 @@ def build_featurizer(pcfg):
     lowercase = bool(fcfg.get("lowercase", True))
     strip_html = bool(fcfg.get("strip_html", True))
     include_url = bool(fcfg.get("include_url_features", True))
+    use_hashing = bool(fcfg.get("use_hashing", False))
 
     # Define fit_transform and transform functions
     def fit_transform(texts):
@@ -221,6 +592,7 @@ def build_featurizer(pcfg):
             lowercase=lowercase,
             strip_html=strip_html,
             include_url_features=include_url,
+            use_hashing=use_hashing,
         )
         X = featurizer.fit_transform(texts)
         return (featurizer, featurizer.include_url_features), X
@@ -3,10 +3,26 @@ Model factory + artifact I/O for the phishing classifier.
 Builds a TF-IDF+URL featurizer and logistic regression, then saves/loads
 their joblib artifacts for runtime use.
 """
-from typing import Dict, Any
+import math
+import os
+from abc import ABC, abstractmethod
+from functools import lru_cache, partial
+from typing import Any, Callable, Dict, Optional, Tuple
+import numpy as np
+from scipy.sparse import csr_matrix, issparse
+from scipy.special import expit
 from sklearn.linear_model import LogisticRegression
 from joblib import dump, load
-from .features import TextURLFeaturizer
+from .features import TextURLFeaturizer, write_atomic
+
+# numba is optional; it fuses the sparse dot products and sigmoids of linear_scorer
+try:
+    from numba import njit
+except Exception as exc:  # pragma: no cover - optional dependency
+    njit = None  # type: ignore
+    NUMBA_IMPORT_ERROR = exc
+else:  # pragma: no cover
+    NUMBA_IMPORT_ERROR = None
 
 # pylint: disable=too-many-arguments
 def build_model(cfg: Dict[str, Any]):
@@ -24,6 +40,7 @@ def build_model(cfg: Dict[str, Any]):
         lowercase=fcfg.get("lowercase", True),
         strip_html=fcfg.get("strip_html", True),
         include_url_features=fcfg.get("include_url_features", True),
+        use_hashing=fcfg.get("use_hashing", False),
     )
 
     # Build classifier
@@ -38,17 +55,53 @@ def build_model(cfg: Dict[str, Any]):
     )
     return {"featurizer": featurizer, "clf": clf}
 
+# joblib dump via write_atomic: an API process that mmaps the old file keeps a valid mapping
+def dump_atomic(obj: Any, path) -> None:
+    write_atomic(path, partial(dump, obj))
+
 # pylint: enable=too-many-arguments
 def save_artifacts(pipe, artifacts_dir: str):
-    """Persist featurizer and classifier to joblib files."""
-    dump(pipe["featurizer"], f"{artifacts_dir}/vectorizer.joblib")
-    dump(pipe["clf"], f"{artifacts_dir}/model.joblib")
+    """Persist featurizer and classifier to joblib files (plus the featurizer as .npz)."""
+    dump_atomic(pipe["featurizer"], f"{artifacts_dir}/vectorizer.joblib")
+    if hasattr(pipe["featurizer"], "save_npz"):
+        pipe["featurizer"].save_npz(f"{artifacts_dir}/vectorizer.npz")
+    dump_atomic(pipe["clf"], f"{artifacts_dir}/model.joblib")
+
+# Modification stamps of the artifact files (0 = no vectorizer.npz); a retrain changes the cache key
+def _artifact_stamp(artifacts_dir: str) -> Tuple[int, int, int]:
+    try:
+        npz_mtime = os.stat(f"{artifacts_dir}/vectorizer.npz").st_mtime_ns
+    except FileNotFoundError:
+        npz_mtime = 0
+    return (
+        os.stat(f"{artifacts_dir}/vectorizer.joblib").st_mtime_ns,
+        os.stat(f"{artifacts_dir}/model.joblib").st_mtime_ns,
+        npz_mtime,
+    )
 
-# pylint: disable=broad-except
 def load_artifacts(artifacts_dir: str):
-    """Load model artifacts and align featurizer expected feature count."""
-    featurizer = load(f"{artifacts_dir}/vectorizer.joblib")
-    clf = load(f"{artifacts_dir}/model.joblib")
+    """
+    Load model artifacts (cached until the files change) and align feature counts.
+    Besides "featurizer" and "clf", the dict carries "score": see linear_scorer.
+    """
+    return dict(_load_artifacts_cached(artifacts_dir, _artifact_stamp(artifacts_dir)))
+
+# Drop cached artifacts (tests, or forcing a reload of unchanged files)
+def clear_artifacts_cache() -> None:
+    _load_artifacts_cached.cache_clear()
+
+# pylint: disable=broad-except
+@lru_cache(maxsize=4)
+def _load_artifacts_cached(artifacts_dir: str, _stamp: Tuple[int, int, int]):
+    vec_mtime, _, npz_mtime = _stamp
+    # The .npz loads without unpickling a vocabulary dict; ignore it if the joblib file is newer
+    if npz_mtime >= vec_mtime:
+        featurizer = TextURLFeaturizer.load_npz(f"{artifacts_dir}/vectorizer.npz")
+    else:
+        featurizer = load(f"{artifacts_dir}/vectorizer.joblib", mmap_mode="r")
+    # Arrays are mapped read-only from the file: pages come from the OS cache and are
+    # shared by every worker process. Scoring uses float32 copies (linear_scorer).
+    clf = load(f"{artifacts_dir}/model.joblib", mmap_mode="r")
     expected = getattr(clf, "n_features_in_", None)
 
     # Align expected feature count if possible
@@ -58,4 +111,184 @@ def load_artifacts(artifacts_dir: str):
             featurizer.expected_total_features = expected
         except Exception:
             pass
-    return {"featurizer": featurizer, "clf": clf}
+
+    # A classifier sized to the text columns alone never sees the URL columns (transform
+    # truncates them away), so skip computing them
+    if (
+        expected is not None
+        and getattr(featurizer, "include_url_features", False)
+        and hasattr(featurizer, "_text_dims")
+        and featurizer._text_dims() == expected
+    ):
+        featurizer.include_url_features = False
+    return {"featurizer": featurizer, "clf": clf, "score": linear_scorer(clf)}
+
+# Binary logistic regression whose decision scores are mapped to probabilities by a
+# calibrator fitted on held-out data; subclasses define the map
+class _CalibratedLR(ABC):
+    estimator: LogisticRegression
+
+    @property
+    def classes_(self) -> np.ndarray:
+        return self.estimator.classes_
+
+    @property
+    def n_features_in_(self) -> int:
+        return self.estimator.n_features_in_
+
+    def decision_function(self, X) -> np.ndarray:
+        return self.estimator.decision_function(X)
+
+    @abstractmethod
+    def _calibrate(self, scores: np.ndarray) -> np.ndarray:
+        """Map decision scores to positive-class probabilities."""
+
+    def predict_proba(self, X) -> np.ndarray:
+        pos = self._calibrate(self.decision_function(X))
+        return np.column_stack([1.0 - pos, pos])
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[(self.predict_proba(X)[:, 1] >= 0.5).astype(int)]
+
+# Binary logistic regression with a Platt sigmoid fitted on held-out decision scores
+class PlattCalibratedLR(_CalibratedLR):
+    """
+    One fitted binary LogisticRegression plus Platt parameters a, b:
+    P(positive) = expit(-(a * decision_function(X) + b)), the same form as
+    CalibratedClassifierCV(method="sigmoid") but with a single model to train and serve.
+    """
+
+    def __init__(self, estimator: LogisticRegression, a: float, b: float):
+        self.estimator = estimator
+        self.a_ = float(a)
+        self.b_ = float(b)
+
+    def _calibrate(self, scores: np.ndarray) -> np.ndarray:
+        return expit(-(self.a_ * scores + self.b_))
+
+# Binary logistic regression with an isotonic map fitted on held-out decision scores
+class IsotonicCalibratedLR(_CalibratedLR):
+    """
+    One fitted binary LogisticRegression plus the breakpoints of an IsotonicRegression
+    (out_of_bounds="clip") fitted on its decision scores: P(positive) is the piecewise
+    linear interpolation through (x_thresholds_, y_thresholds_), constant past the ends.
+    """
+
+    def __init__(self, estimator: LogisticRegression, x_thresholds, y_thresholds):
+        self.estimator = estimator
+        self.x_thresholds_ = np.asarray(x_thresholds, dtype=np.float64)
+        self.y_thresholds_ = np.asarray(y_thresholds, dtype=np.float64)
+
+    def _calibrate(self, scores: np.ndarray) -> np.ndarray:
+        return np.interp(scores, self.x_thresholds_, self.y_thresholds_)
+
+# Fold parameters of a sigmoid-calibrated binary LR, stacked one column per fold:
+# weights (n_features, k), biases (k,), sigmoid a (k,), sigmoid b (k,)
+def _sigmoid_folds(clf) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+    if isinstance(clf, PlattCalibratedLR):
+        est = clf.estimator
+        if est.coef_.shape[0] != 1:
+            return None
+        return (
+            np.ascontiguousarray(est.coef_.T, dtype=np.float32),
+            np.array(est.intercept_[:1], dtype=np.float32),
+            np.array([clf.a_], dtype=np.float32),
+            np.array([clf.b_], dtype=np.float32),
+        )
+    if getattr(clf, "method", None) != "sigmoid" or len(getattr(clf, "classes_", ())) != 2:
+        return None
+    ccs = list(getattr(clf, "calibrated_classifiers_", ()))
+    if not ccs:
+        return None
+    for cc in ccs:
+        est = cc.estimator
+        if not isinstance(est, LogisticRegression) or est.coef_.shape[0] != 1 or len(cc.calibrators) != 1:
+            return None
+    W = np.ascontiguousarray(np.vstack([cc.estimator.coef_[0] for cc in ccs]).T, dtype=np.float32)
+    B = np.array([cc.estimator.intercept_[0] for cc in ccs], dtype=np.float32)
+    A = np.array([cc.calibrators[0].a_ for cc in ccs], dtype=np.float32)
+    C = np.array([cc.calibrators[0].b_ for cc in ccs], dtype=np.float32)
+    return W, B, A, C
+
+# Mean over folds f of 1 / (1 + exp(A[f] * (row . W[:, f] + B[f]) + C[f])) for each CSR row,
+# in one pass over the row's nonzeros and without temporary arrays
+_csr_sigmoid_kernel = None
+if njit is not None:
+    @njit(cache=True, nogil=True)
+    def _csr_sigmoid_kernel(indptr, indices, data, W, B, A, C, out):  # pragma: no cover - compiled
+        k = B.shape[0]
+        z = np.empty(k, dtype=np.float32)
+        for r in range(out.shape[0]):
+            z[:] = B
+            for j in range(indptr[r], indptr[r + 1]):
+                x = data[j]
+                w = W[indices[j]]
+                for f in range(k):
+                    z[f] += x * w[f]
+            total = 0.0
+            for f in range(k):
+                total += 1.0 / (1.0 + math.exp(A[f] * z[f] + C[f]))
+            out[r] = total / k
+
+# A 1 x n_features CSR row with no entries and the featurizer's index/data dtypes
+def _empty_csr_row(n_features: int):
+    return csr_matrix(
+        (np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int32), np.zeros(2, dtype=np.int32)),
+        shape=(1, n_features),
+    )
+
+# score(X) over stacked (W, B, A, C): the numba kernel for CSR input, else sparse-dense numpy
+def _stacked_scorer(W: np.ndarray, B: np.ndarray, A: np.ndarray, C: np.ndarray) -> Callable[[Any], np.ndarray]:
+    def score_numpy(X):
+        # Same arithmetic as _SigmoidCalibration per fold (columns), then the fold mean
+        Z = X.astype(np.float32, copy=False) @ W
+        Z += B
+        return expit(-(A * Z + C)).mean(axis=1)
+
+    if _csr_sigmoid_kernel is None:
+        return score_numpy
+
+    def score(X):
+        if not (issparse(X) and X.format == "csr"):
+            return score_numpy(X)
+        out = np.empty(X.shape[0], dtype=np.float32)
+        _csr_sigmoid_kernel(
+            X.indptr, X.indices, X.data.astype(np.float32, copy=False), W, B, A, C, out
+        )
+        return out
+
+    # Compile (or load from the on-disk cache) now rather than on the first request
+    score(_empty_csr_row(W.shape[0]))
+    return score
+
+# Positive-class probability straight from the weights, skipping predict_proba
+def linear_scorer(clf) -> Callable[[Any], np.ndarray]:
+    """
+    Return score(X) -> 1-D positive-class probabilities, equal to clf.predict_proba(X)[:, 1].
+    Binary LogisticRegression, Platt/IsotonicCalibratedLR and sigmoid CalibratedClassifierCV
+    over LR become sparse dot products with pre-extracted weights (no input validation, no 2-column output);
+    the calibrated folds are stacked so all of them cost one sparse-dense product, or one
+    pass over the nonzeros of each CSR row when numba is installed.
+    Anything else falls back to predict_proba.
+    Weights are float32 like the featurizer output, so the dot never upcasts; results
+    differ from predict_proba only in float32 rounding (~1e-7).
+    """
+    if isinstance(clf, LogisticRegression) and clf.coef_.shape[0] == 1:
+        w, b = clf.coef_[0].astype(np.float32), np.float32(clf.intercept_[0])
+        if _csr_sigmoid_kernel is None:
+            return lambda X: expit(X.astype(np.float32, copy=False) @ w + b)
+        # expit(z) as the one-fold form 1 / (1 + exp(-1 * z + 0))
+        one = np.ones(1, dtype=np.float32)
+        return _stacked_scorer(w.reshape(-1, 1), np.array([b]), -one, 0 * one)
+
+    folds = _sigmoid_folds(clf)
+    if folds is not None:
+        return _stacked_scorer(*folds)
+
+    if isinstance(clf, IsotonicCalibratedLR) and clf.estimator.coef_.shape[0] == 1:
+        w, b = clf.estimator.coef_[0].astype(np.float32), np.float32(clf.estimator.intercept_[0])
+        xs, ys = clf.x_thresholds_, clf.y_thresholds_
+        # Binary search over the breakpoints per score
+        return lambda X: np.interp(X.astype(np.float32, copy=False) @ w + b, xs, ys).astype(np.float32)
+
+    return lambda X: clf.predict_proba(X)[:, 1]
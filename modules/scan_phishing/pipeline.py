@@ -2,35 +2,110 @@ from pathlib import Path
 import json
 import warnings
 import pandas as pd
-from joblib import dump, load
+from joblib import load
 from sklearn.linear_model import LogisticRegression
-from sklearn.calibration import CalibratedClassifierCV
+from sklearn.calibration import _sigmoid_calibration
+from sklearn.isotonic import IsotonicRegression
+from sklearn.utils.class_weight import compute_sample_weight
 from sklearn.metrics import classification_report, average_precision_score, precision_recall_curve
 import numpy as np
 
-from .features import build_featurizer
+from .features import TextURLFeaturizer, build_featurizer
+from .model import IsotonicCalibratedLR, PlattCalibratedLR, dump_atomic, linear_scorer
+
+# pyarrow is optional; with it CSVs are parsed by its multi-threaded C++ reader
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pacsv
+except Exception as exc:  # pragma: no cover - optional dependency
+    pa = pacsv = None  # type: ignore
+    PYARROW_IMPORT_ERROR = exc
+else:  # pragma: no cover
+    PYARROW_IMPORT_ERROR = None
+
+# sklearnex is optional; with it the LR is fitted by oneDAL's vectorized solver
+try:
+    from sklearnex.linear_model import LogisticRegression as OneDALLogisticRegression
+except Exception as exc:  # pragma: no cover - optional dependency
+    OneDALLogisticRegression = None  # type: ignore
+    SKLEARNEX_IMPORT_ERROR = exc
+else:  # pragma: no cover
+    SKLEARNEX_IMPORT_ERROR = None
+
+# numba is optional; it finds the best-F1 point of the PR curve in one pass
+try:
+    from numba import njit
+except Exception as exc:  # pragma: no cover - optional dependency
+    njit = None  # type: ignore
+    NUMBA_IMPORT_ERROR = exc
+else:  # pragma: no cover
+    NUMBA_IMPORT_ERROR = None
+
+_best_f1_kernel = None
+if njit is not None:
+    @njit(cache=True)
+    def _best_f1_kernel(p, r):  # pragma: no cover - compiled
+        best, best_idx = -1.0, 0
+        for i in range(p.shape[0]):
+            s = p[i] + r[i]
+            f1 = 2.0 * p[i] * r[i] / (s if s > 1e-9 else 1e-9)
+            if f1 > best:  # NaN never compares greater, as in nanargmax
+                best, best_idx = f1, i
+        return best_idx
+
+# Index of the max-F1 point on a precision/recall curve (first one on ties)
+def _best_f1_index(p: np.ndarray, r: np.ndarray) -> int:
+    if _best_f1_kernel is not None:
+        return int(_best_f1_kernel(p, r))
+    f1 = (2*p*r) / np.clip(p+r, 1e-9, None)
+    return int(np.nanargmax(f1))
+
+# pandas' default na_values (read_csv docs): pyarrow must treat the same cells as missing,
+# or training text would depend on which reader is installed
+_PANDAS_NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
 
 # Read CSV and return text + label arrays.
 def _read(csv_path, text_col, label_col):
     """Load CSV and return text/label arrays with required columns enforced."""
-    df = pd.read_csv(csv_path)
-    if text_col not in df.columns or label_col not in df.columns:
+    # Header first, so a missing column keeps its own error instead of a parser one
+    columns = pd.read_csv(csv_path, nrows=0).columns
+    if text_col not in columns or label_col not in columns:
         raise ValueError(f"{csv_path} must have columns '{text_col}' and '{label_col}'")
+    if pacsv is not None:
+        table = pacsv.read_csv(
+            csv_path,
+            # Email bodies span lines inside quoted fields
+            parse_options=pacsv.ParseOptions(newlines_in_values=True),
+            convert_options=pacsv.ConvertOptions(
+                include_columns=[text_col, label_col],
+                column_types={text_col: pa.string()},
+                null_values=_PANDAS_NA_VALUES,
+                strings_can_be_null=True,
+            ),
+        )
+        df = table.to_pandas()
+    else:
+        df = pd.read_csv(csv_path, usecols=[text_col, label_col])
     return df[text_col].astype(str).fillna(""), df[label_col].astype(int).to_numpy()
 
 # Persist vectorizer and classifier to disk.
 def save_artifacts(vec, clf, artifacts_dir: str):
-    """Save fitted vectorizer and classifier to joblib files."""
+    """Save fitted vectorizer and classifier to joblib files (plus the vectorizer as .npz)."""
     d = Path(artifacts_dir); d.mkdir(parents=True, exist_ok=True)
-    dump(vec, d / "vectorizer.joblib")
-    dump(clf, d / "model.joblib")
+    dump_atomic(vec, d / "vectorizer.joblib")
+    if hasattr(vec, "save_npz"):
+        vec.save_npz(d / "vectorizer.npz")
+    dump_atomic(clf, d / "model.joblib")
 
 # Load vectorizer and classifier from disk (runtime use).
 def load_artifacts(artifacts_dir: str):
     """Load vectorizer + classifier artifacts; align feature count if present."""
     d = Path(artifacts_dir)
-    featurizer = load(d / "vectorizer.joblib")
-    clf = load(d / "model.joblib")
+    featurizer = load(d / "vectorizer.joblib", mmap_mode="r")
+    clf = load(d / "model.joblib", mmap_mode="r")
     expected = getattr(clf, "n_features_in_", None)
     if expected is not None:
         try:
@@ -42,6 +117,29 @@ def load_artifacts(artifacts_dir: str):
         "clf": clf,
     }
 
+# Fit a LogisticRegression, on oneDAL when sklearnex is installed.
+def _fit_lr(base: LogisticRegression, X, y) -> LogisticRegression:
+    """
+    Return base fitted on (X, y). With sklearnex the fit runs on its LR (lbfgs, balanced
+    class weights passed as sample weights) and the result is copied back into a stock
+    sklearn LogisticRegression, so artifacts load without sklearnex. Inputs oneDAL does
+    not support are fitted by sklearn inside sklearnex.
+    """
+    if OneDALLogisticRegression is None:
+        return base.fit(X, y)
+    params = base.get_params()
+    sample_weight = None
+    if params["class_weight"] == "balanced":
+        sample_weight = compute_sample_weight("balanced", y)
+        params["class_weight"] = None
+    fast = OneDALLogisticRegression(**params).fit(X, y, sample_weight=sample_weight)
+    base.classes_ = np.asarray(fast.classes_)
+    base.coef_ = np.asarray(fast.coef_)
+    base.intercept_ = np.asarray(fast.intercept_)
+    base.n_iter_ = np.asarray(fast.n_iter_)
+    base.n_features_in_ = fast.n_features_in_
+    return base
+
 # Train the phishing model, evaluate on validation, and write artifacts/metrics.
 def train(cfg):
     """Train phishing model, evaluate on validation, and write artifacts/metrics."""
@@ -61,27 +159,37 @@ def train(cfg):
         C=mc.get("C", 2.0),
         class_weight=mc.get("class_weight", "balanced"),
         max_iter=mc.get("max_iter", 200),
+        solver="lbfgs",  # sklearn's default, and the solver sklearnex accelerates
     )
-    # Ensure calibration folds do not exceed the minority-class count.
     labels, counts = np.unique(ytr, return_counts=True)
     if counts.size < 2:
         raise ValueError("Training data must contain at least two classes.")
-    minority = counts.min()
-    if minority < 3:
-        warnings.warn(
-            f"Only {minority} samples in the smallest class; skipping 3-fold calibration.",
-            RuntimeWarning,
-        )
-    if minority >= 2:
-        cv_folds = max(2, min(3, int(minority)))
-        clf = CalibratedClassifierCV(base, method="sigmoid", cv=cv_folds).fit(Xtr, ytr)
-        calibration_info = {"cv_folds": cv_folds, "calibrated": True}
+    clf = _fit_lr(base, Xtr, ytr)
+
+    # Calibrate on the validation scores: one LR fit plus a small map (Platt's two scalars,
+    # or isotonic breakpoints), instead of CalibratedClassifierCV refitting the LR per fold.
+    # For any better-than-chance LR the sigmoid is increasing, so PR-AUC below is unaffected
+    # by fitting it on this split; isotonic can merge scores into ties, so prefer it only
+    # with a large validation set.
+    method = mc.get("calibration", "sigmoid") or "none"
+    if method not in ("sigmoid", "isotonic", "none"):
+        raise ValueError(f"Unknown phishing.model.calibration '{method}' (sigmoid, isotonic or none)")
+    if method != "none" and np.unique(yva).size == 2:
+        scores = clf.decision_function(Xva)
+        if method == "isotonic":
+            iso = IsotonicRegression(y_min=0.0, y_max=1.0, out_of_bounds="clip").fit(scores, yva)
+            clf = IsotonicCalibratedLR(clf, iso.X_thresholds_, iso.y_thresholds_)
+        else:
+            a, b = _sigmoid_calibration(scores, yva)
+            clf = PlattCalibratedLR(clf, a, b)
+        calibration_info = {"method": method, "fitted_on": "valid", "calibrated": True}
     else:
-        clf = base.fit(Xtr, ytr)
-        calibration_info = {"cv_folds": 0, "calibrated": False}
+        if method != "none":
+            warnings.warn("Validation data has a single class; skipping calibration.", RuntimeWarning)
+        calibration_info = {"method": None, "calibrated": False}
 
-    # Eval
-    prob = clf.predict_proba(Xva)[:,1]
+    # Eval: positive-class probabilities only (float32), straight from the weights
+    prob = linear_scorer(clf)(Xva)
     thr = float(pcfg.get("threshold", 0.5))
     pred = (prob >= thr).astype(int)
     pr_auc = float(average_precision_score(yva, prob))
@@ -89,8 +197,7 @@ def train(cfg):
 
     # Suggest threshold (max F1)
     p, r, th = precision_recall_curve(yva, prob)
-    f1 = (2*p*r) / np.clip(p+r, 1e-9, None)
-    best_idx = int(np.nanargmax(f1))
+    best_idx = _best_f1_index(p, r)
     best_thr = float(0.0 if best_idx >= len(th) else th[best_idx])
 
     # Save
@@ -110,14 +217,17 @@ def evaluate(cfg):
     """Reload artifacts and run validation metrics on the holdout split."""
     pcfg, dcfg = cfg["phishing"], cfg["phishing"]["data"]
     artifacts = Path(pcfg.get("artifacts_dir", "modules/scan_phishing/artifacts"))
-    vec = load(artifacts / "vectorizer.joblib")
-    clf = load(artifacts / "model.joblib")
+    vec = load(artifacts / "vectorizer.joblib", mmap_mode="r")
+    clf = load(artifacts / "model.joblib", mmap_mode="r")
 
     Xva_text, yva = _read(dcfg["valid_csv"], dcfg["text_column"], dcfg["label_column"])
     # Rebuild transform closure for fitted vec
     def transform(texts):
         from .features import UrlFeatures
         X_tfidf = vec.transform(texts)
+        # TextURLFeaturizer artifacts already append their URL columns
+        if isinstance(vec, TextURLFeaturizer):
+            return X_tfidf
         if pcfg.get("features", {}).get("include_url_features", True):
             X_url = UrlFeatures().transform(texts)
             from scipy.sparse import hstack
@@ -126,7 +236,7 @@ def evaluate(cfg):
 
     # 
     Xva = transform(Xva_text)
-    prob = clf.predict_proba(Xva)[:,1]
+    prob = linear_scorer(clf)(Xva)
     thr = float(pcfg.get("threshold", 0.5))
     pred = (prob >= thr).astype(int)
     pr_auc = float(average_precision_score(yva, prob))
@@ -1,9 +1,14 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional
 
+# Request/response payloads are never mutated after validation
+_FROZEN = ConfigDict(frozen=True)
+
 # Input schema for phishing prediction requests
 class EmailIn(BaseModel):
     """Input payload for phishing prediction requests."""
+    model_config = _FROZEN
+
     subject: Optional[str] = None
     body: Optional[str] = None
     raw: Optional[str] = None  # if provided, model uses this instead of subject/body
@@ -11,12 +16,16 @@ class EmailIn(BaseModel):
 # Output schema for prediction results
 class PredictOut(BaseModel):
     """API response for predictions."""
+    model_config = _FROZEN
+
     label: int = Field(..., description="1=phishing, 0=legit")
     probability: float
 
 # Input schema for feedback submission
 class FeedbackIn(BaseModel):
     """Incoming feedback payload (optional feature)."""
+    model_config = _FROZEN
+
     prediction_id: Optional[str] = None
     label: int = Field(..., ge=0, le=1)
     subject: Optional[str] = None
@@ -28,5 +37,7 @@ class FeedbackIn(BaseModel):
 # Output schema for feedback acknowledgement
 class FeedbackOut(BaseModel):
     """Feedback acknowledgement."""
+    model_config = _FROZEN
+
     ok: bool
     id: str
@@ -10,16 +10,22 @@ Endpoints:
 """
 from __future__ import annotations
 
+import asyncio
 import hashlib
 import logging
+import threading
+import time
+from collections import OrderedDict, deque
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 # Load environment variables early so PHISH_CFG / MONGODB_URI are visible
 from dotenv import load_dotenv
 load_dotenv()
 
 from fastapi import APIRouter, UploadFile, File, HTTPException
+from bson.errors import InvalidDocument
+from pymongo.errors import DuplicateKeyError
 from email import policy
 import email
 
@@ -27,6 +33,7 @@ from .schemas import EmailIn, PredictOut
 from .model import load_artifacts
 from core.config import load_config
 from core.db.mongodb import get_db, reset_db
+from core.responses import FastJSONResponse
 
 
 
@@ -42,6 +49,13 @@ _pcfg: Dict[str, Any] = {}
 _pipe: Dict[str, Any] = {}
 _db = None  # pymongo.database.Database | None
 
+# Hot-path handles bound from _pipe/_pcfg on (re)load, so predictions skip the dict lookups
+_FEATURIZER: Any = None
+_TRANSFORM: Any = None
+_SCORE: Any = None  # X -> positive-class probabilities (model.linear_scorer)
+_THRESHOLD: float = 0.5
+_MAX_EML_BYTES: int = 10 * 1024 * 1024  # phishing.max_eml_bytes; 0 = no limit
+
 
 def _load_everything() -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any], Optional[Any]]:
     """
@@ -70,8 +84,236 @@ def _load_everything() -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any],
     return cfg, pcfg, pipe, db
 
 
+# -------------------------
+# Micro-batching
+# -------------------------
+class _PredictBatcher:
+    """
+    Coalesces concurrent predictions into one transform + scoring call.
+    Callers queue (text, future); a worker task takes everything already queued (up
+    to max_batch, optionally waiting `window` seconds for more), scores the batch in
+    a worker thread so the event loop stays free, and resolves each future.
+    With no concurrency a request is scored alone, without added latency.
+    """
+
+    def __init__(self) -> None:
+        self.max_batch = 64
+        self.window = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    # Apply phishing.batching settings
+    def configure(self, pcfg: Dict[str, Any]) -> None:
+        bcfg = pcfg.get("batching", {}) or {}
+        self.max_batch = max(1, int(bcfg.get("max_batch", 64)))
+        self.window = max(0.0, float(bcfg.get("window_ms", 0)) / 1000.0)
+
+    # Queue one text and wait for its phishing probability
+    async def score(self, text: str) -> float:
+        loop = asyncio.get_running_loop()
+        # (Re)start the worker on this loop; a new loop (e.g. per test client) needs its own
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run(self._queue))
+        fut = loop.create_future()
+        self._queue.put_nowait((text, fut))
+        return await fut
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                if not queue.empty():
+                    batch.append(queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            texts = [text for text, _ in batch]
+            try:
+                probs = await loop.run_in_executor(None, _score_batch, texts)
+            except Exception as exc:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(exc)
+                continue
+            for (_, fut), prob in zip(batch, probs):
+                # Skip callers that went away (cancelled request)
+                if not fut.done():
+                    fut.set_result(float(prob))
+
+
+# Bind the hot-path handles to freshly loaded artifacts/config
+def _bind_runtime(pcfg: Dict[str, Any], pipe: Dict[str, Any]) -> None:
+    global _FEATURIZER, _TRANSFORM, _SCORE, _THRESHOLD, _MAX_EML_BYTES
+    _FEATURIZER = pipe["featurizer"]
+    _TRANSFORM = _FEATURIZER.transform
+    _SCORE = pipe["score"]
+    _THRESHOLD = float(pcfg.get("threshold", 0.5))
+    _MAX_EML_BYTES = max(0, int(pcfg.get("max_eml_bytes", 10 * 1024 * 1024)))
+
+
+# Score a batch of texts with the current artifacts (sparse dot + sigmoid, no predict_proba)
+def _score_batch(texts: List[str]):
+    return _SCORE(_TRANSFORM(texts))
+
+
+# LRU of recent probabilities keyed by a 16-byte text digest (repeated campaign mails, probes)
+class _ScoreCache:
+    """
+    Small LRU touched only from the event loop thread (reload_runtime reconfigures it
+    there too), so no locking. Each configure() starts a new generation; a score
+    computed under an older one (request in flight across /reload) is not stored.
+    """
+
+    def __init__(self) -> None:
+        self.maxsize = 4096
+        self.generation = 0
+        self._items: "OrderedDict[bytes, float]" = OrderedDict()
+
+    # Apply phishing.score_cache_size (0 disables) and drop cached scores
+    def configure(self, pcfg: Dict[str, Any]) -> None:
+        self.maxsize = max(0, int(pcfg.get("score_cache_size", 4096)))
+        self.generation += 1
+        self._items.clear()
+
+    def get(self, key: bytes) -> Optional[float]:
+        prob = self._items.get(key)
+        if prob is not None:
+            self._items.move_to_end(key)
+        return prob
+
+    def put(self, key: bytes, prob: float, generation: int) -> None:
+        if self.maxsize <= 0 or generation != self.generation:
+            return
+        self._items[key] = prob
+        self._items.move_to_end(key)
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+
+# Strict UTF-8 bytes of text, or None if it holds lone surrogates (possible via JSON escapes)
+def _utf8(text: str) -> Optional[bytes]:
+    try:
+        return text.encode("utf-8")
+    except UnicodeEncodeError:
+        return None
+
+
+# Cached probability, or a batched score on a miss; encoded is _utf8(text)
+async def _predict_prob(text: str, encoded: Optional[bytes]) -> float:
+    if encoded is None:
+        encoded = text.encode("utf-8", "surrogatepass")
+    key = hashlib.blake2b(encoded, digest_size=16).digest()
+    prob = _score_cache.get(key)
+    if prob is None:
+        generation = _score_cache.generation
+        prob = await _batcher.score(text)
+        _score_cache.put(key, prob, generation)
+    return prob
+
+
+# Buffered prediction logging
+class _PredictionLogWriter:
+    """
+    Queues prediction documents and writes them with insert_many from a daemon thread.
+    A batch goes out once flush_batch docs are queued or flush_ms after the first one,
+    so a request only pays for a deque append instead of a Mongo round-trip.
+    flush() drains the queue synchronously (reload, shutdown).
+    """
+
+    def __init__(self) -> None:
+        self.max_batch = 500
+        self.interval = 0.2
+        self._queue: deque = deque()  # (db, collection name, doc)
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()  # one insert at a time, so flush() waits for in-flight batches
+        self._thread: Optional[threading.Thread] = None
+
+    # Apply phishing.logging.flush_batch / flush_ms
+    def configure(self, mcfg: Dict[str, Any]) -> None:
+        self.max_batch = max(1, int(mcfg.get("flush_batch", 500)))
+        self.interval = max(0.0, float(mcfg.get("flush_ms", 200)) / 1000.0)
+
+    # Queue one document for db[col_name]
+    def put(self, db: Any, col_name: str, doc: Dict[str, Any]) -> None:
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="phishing-log-writer", daemon=True)
+                self._thread.start()
+            self._queue.append((db, col_name, doc))
+            if len(self._queue) == 1 or len(self._queue) >= self.max_batch:
+                self._cond.notify()
+
+    # Write out everything queued so far
+    def flush(self) -> None:
+        with self._io_lock:
+            while self._queue:
+                self._write_batch()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                deadline = time.monotonic() + self.interval
+                while len(self._queue) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            with self._io_lock:
+                self._write_batch()
+
+    # Pop up to max_batch docs and insert them; caller holds _io_lock
+    def _write_batch(self) -> None:
+        with self._cond:
+            n = min(len(self._queue), self.max_batch)
+            items = [self._queue.popleft() for _ in range(n)]
+
+        # Group by target; a reload can switch database/collection mid-queue
+        groups: Dict[Tuple[int, str], Tuple[Any, str, List[Dict[str, Any]]]] = {}
+        for db, col_name, doc in items:
+            groups.setdefault((id(db), col_name), (db, col_name, []))[2].append(doc)
+
+        for db, col_name, docs in groups.values():
+            try:
+                db[col_name].insert_many(docs, ordered=False)
+            except (InvalidDocument, UnicodeEncodeError):
+                # One unencodable doc aborts the batch; retry one by one so only bad docs are lost
+                for doc in docs:
+                    try:
+                        db[col_name].insert_one(doc)
+                    except DuplicateKeyError:
+                        pass  # written before the batch aborted
+                    except Exception as e:
+                        logger.exception("Mongo logging failed: %s", e)
+                continue
+            except Exception as e:
+                logger.exception("Mongo logging failed for %d predictions: %s", len(docs), e)
+                continue
+            logger.info("Logged %d predictions to Mongo: %s.%s", len(docs), db.name, col_name)
+
+
+_batcher = _PredictBatcher()
+_score_cache = _ScoreCache()
+_log_writer = _PredictionLogWriter()
+
 # Initialize on import
 _cfg, _pcfg, _pipe, _db = _load_everything()
+_bind_runtime(_pcfg, _pipe)
+_batcher.configure(_pcfg)
+_score_cache.configure(_pcfg)
+_log_writer.configure(_pcfg.get("logging", {}) or {})
 
 # -------------------------
 # Helpers
@@ -81,22 +323,24 @@ def _combine_text(subject: Optional[str], body: Optional[str], raw: Optional[str
     """Prefer raw if provided; otherwise stitch subject + body."""
     if raw:
         return raw
-    subject = subject or ""
-    body = body or ""
-    return f"subject: {subject}\n\n{body}"
+    # One f-string (a single BUILD_STRING) beats "".join / concatenation here; the
+    # "subject: " prefix stays even when empty, since the model was trained on it
+    return f"subject: {subject or ''}\n\n{body or ''}"
 
 
-# Optionally log a prediction to Mongo, honoring logging config.
+# Optionally queue a prediction for Mongo, honoring logging config.
 def _mongo_log_prediction(
     text: str,
     email_in: EmailIn,
     label: int,
     prob: float,
     source: str,
+    encoded: Optional[bytes] = None,
 ) -> None:
     """
-    Insert a prediction record into Mongo if configured.
+    Queue a prediction record for Mongo if configured (written in batches by _log_writer).
     Does nothing if _db is None or logging is disabled in config.
+    encoded: _utf8(text) if the caller has it, so text is not encoded again for the hash.
     """
     # Only log according to config
     if _db is not None:
@@ -118,23 +362,24 @@ def _mongo_log_prediction(
                 else (text[: int(mcfg.get("store_snippet_chars", 160))] if text else "")
             )
 
-            # Insert into Mongo
             doc = {
                 "ts": datetime.now(timezone.utc),
                 "label": label,
                 "probability": prob,
-                "threshold": float(_pcfg.get("threshold", 0.5)),
+                "threshold": _THRESHOLD,
                 "subject": email_in.subject if mcfg.get("store_text", False) else None,
                 "body": email_in.body if mcfg.get("store_text", False) else None,
                 "raw_present": bool(email_in.raw),
-                "text_sha256": hashlib.sha256((text or "").encode("utf-8", errors="ignore")).hexdigest(),
+                # Strict UTF-8 is byte-identical to errors="ignore" whenever it succeeds
+                "text_sha256": hashlib.sha256(
+                    encoded if encoded is not None else (text or "").encode("utf-8", errors="ignore")
+                ).hexdigest(),
                 "snippet": snippet,
                 "source": source,
             }
 
-            # Insert document
-            _db[col_name].insert_one(doc)
-            logger.info("Logged prediction to Mongo: %s.%s", _cfg["mongodb"]["database"], col_name)
+            # Queue document; the writer thread inserts it with the next batch
+            _log_writer.put(_db, col_name, doc)
         except Exception as e:
             logger.exception("Mongo logging failed: %s", e)
     else:
@@ -157,39 +402,22 @@ def _parse_eml_bytes(data: bytes) -> Tuple[str, str]:
     subject = msg.get("subject") or ""
     body_text, html_text = "", ""
 
-    # Extract body parts
-    if msg.is_multipart():
-
-        # Walk parts to find text/plain and text/html
-        for part in msg.walk():
-            ctype = part.get_content_type()
-
-            # Prefer text/plain
-            if ctype == "text/plain" and not body_text:
-                try:
-                    body_text = part.get_content()
-                except Exception:
-                    pass
-            #   Fallback to text/html    
-            elif ctype == "text/html" and not html_text:
-                try:
-                    html_text = part.get_content()
-                except Exception:
-                    pass
-
-    # Non-multipart message            
-    else:
-        ctype = msg.get_content_type()
-        try:
-            # Prefer text/plain
-            if ctype == "text/plain":
-                body_text = msg.get_content()
-
-            #  Fallback to text/html    
-            elif ctype == "text/html":
-                html_text = msg.get_content()
-        except Exception:
-            pass
+    # One pass over the parts (a non-multipart message walks as itself); stop at the
+    # first non-empty text/plain, keeping the first text/html as the fallback
+    for part in msg.walk():
+        ctype = part.get_content_type()
+        if ctype == "text/plain":
+            try:
+                body_text = part.get_content()
+            except Exception:
+                continue
+            if body_text:
+                break
+        elif ctype == "text/html" and not html_text:
+            try:
+                html_text = part.get_content()
+            except Exception:
+                pass
 
     body = body_text or html_text or ""
     return subject, body
@@ -214,28 +442,38 @@ def health() -> Dict[str, Any]:
 
 # Reload config/artifacts/DB without restarting the process.
 @router.post("/reload")
-def reload_runtime() -> Dict[str, Any]:
+async def reload_runtime() -> Dict[str, Any]:
     """
     Reload config, artifacts, and DB at runtime (no process restart).
     Closes the previous Mongo client so TLS/URI changes are picked up.
+    Blocking work runs in threads; the rebinding and cache reset stay on the event
+    loop, where the prediction handlers read them.
     """
     global _cfg, _pcfg, _pipe, _db
 
+    # Write queued predictions while the old client is still open
+    await asyncio.to_thread(_log_writer.flush)
+
     # Close cached client so new settings (URI, TLS, CA) take effect
     try:
-        reset_db()
+        await asyncio.to_thread(reset_db)
     except Exception:
         pass
 
     # Rebuild everything
-    _cfg, _pcfg, _pipe, _db = _load_everything()
+    cfg, pcfg, pipe, db = await asyncio.to_thread(_load_everything)
+    _cfg, _pcfg, _pipe, _db = cfg, pcfg, pipe, db
+    _bind_runtime(_pcfg, _pipe)
+    _batcher.configure(_pcfg)
+    _score_cache.configure(_pcfg)  # new artifacts may score differently
+    _log_writer.configure(_pcfg.get("logging", {}) or {})
 
     # Definitive Mongo check (ping)
     mongo_ok = False
     mongo_err = None
-    if _db is not None:
+    if db is not None:
         try:
-            _db.command("ping")
+            await asyncio.to_thread(db.command, "ping")
             mongo_ok = True
         except Exception as e:
             mongo_err = f"{type(e).__name__}: {e}"
@@ -252,9 +490,23 @@ def reload_runtime() -> Dict[str, Any]:
     }
 
 
+# PredictOut body rendered straight by orjson. Returning a Response skips FastAPI's
+# response_model validation/serialization; response_model still documents the shape.
+def _predict_response(label: int, prob: float) -> FastJSONResponse:
+    return FastJSONResponse({"label": label, "probability": prob})
+
+
+# Write queued prediction logs before the process exits.
+def _flush_prediction_logs() -> None:
+    _log_writer.flush()
+
+
+router.add_event_handler("shutdown", _flush_prediction_logs)
+
+
 # Predict from JSON payload (subject/body/raw).
 @router.post("/predict", response_model=PredictOut)
-def predict(email_in: EmailIn) -> PredictOut:
+async def predict(email_in: EmailIn) -> FastJSONResponse:
     """
     Predict phishing from JSON payload:
     {
@@ -264,30 +516,45 @@ def predict(email_in: EmailIn) -> PredictOut:
     }
     """
     text = _combine_text(email_in.subject, email_in.body, email_in.raw)
-    X = _pipe["featurizer"].transform([text])
-    prob = float(_pipe["clf"].predict_proba(X)[0, 1])
-    label = int(prob >= _pcfg.get("threshold", 0.5))
+    encoded = _utf8(text)
+    prob = await _predict_prob(text, encoded)
+    label = int(prob >= _THRESHOLD)
 
-    _mongo_log_prediction(text=text, email_in=email_in, label=label, prob=prob, source="api/phishing")
-    return PredictOut(label=label, probability=prob)
+    # Only queues the record; the Mongo write happens on the log writer thread
+    _mongo_log_prediction(
+        text=text, email_in=email_in, label=label, prob=prob, source="api/phishing", encoded=encoded,
+    )
+    return _predict_response(label, prob)
 
 
 # Predict from uploaded .eml file.
 @router.post("/upload", response_model=PredictOut)
-async def predict_eml(file: UploadFile = File(...)) -> PredictOut:
+async def predict_eml(file: UploadFile = File(...)) -> FastJSONResponse:
     """
     Upload a .eml file and classify. Logs to Mongo using same policy.
+    Rejects files larger than phishing.max_eml_bytes with 413.
     """
-    data = await file.read()
-    subject, body = _parse_eml_bytes(data)
+    limit = _MAX_EML_BYTES
+    if limit and file.size is not None and file.size > limit:
+        raise HTTPException(status_code=413, detail=f"EML too large (max {limit} bytes)")
+
+    # Read at most one byte past the limit, in case the size was not known up front
+    data = await file.read(limit + 1 if limit else -1)
+    if limit and len(data) > limit:
+        raise HTTPException(status_code=413, detail=f"EML too large (max {limit} bytes)")
+
+    # Parsing is pure-Python and CPU-bound; keep it off the event loop
+    subject, body = await asyncio.to_thread(_parse_eml_bytes, data)
 
     # For model features, we still build a normalized text from subject+body
     text = _combine_text(subject, body, None)
-    X = _pipe["featurizer"].transform([text])
-    prob = float(_pipe["clf"].predict_proba(X)[0, 1])
-    label = int(prob >= _pcfg.get("threshold", 0.5))
+    encoded = _utf8(text)
+    prob = await _predict_prob(text, encoded)
+    label = int(prob >= _THRESHOLD)
 
     tmp = EmailIn(subject=subject, body=body, raw=None)  # for consistent logging
-    _mongo_log_prediction(text=text, email_in=tmp, label=label, prob=prob, source="api/phishing/upload")
+    _mongo_log_prediction(
+        text=text, email_in=tmp, label=label, prob=prob, source="api/phishing/upload", encoded=encoded,
+    )
 
-    return PredictOut(label=label, probability=prob)
+    return _predict_response(label, prob)
@@ -1,22 +1,46 @@
 # scripts/stratified_split.py
 import sys, pandas as pd
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import StratifiedShuffleSplit
 from pathlib import Path
 
+# pyarrow is optional; it reads and writes the CSVs with its multi-threaded C++ codec
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pacsv
+except Exception:  # pragma: no cover - optional dependency
+    pa = pacsv = None
+
 if len(sys.argv) != 4:
     print("Usage: python scripts/stratified_split.py <all.csv> <train.csv> <valid.csv>")
     raise SystemExit(1)
 
 src, dst_train, dst_valid = sys.argv[1:]
-df = pd.read_csv(src)
-assert {'text','label'}.issubset(df.columns), "CSV must have columns: text,label"
+# Check the header before parsing a possibly huge file
+assert {'text','label'}.issubset(pd.read_csv(src, nrows=0).columns), "CSV must have columns: text,label"
+# Labels are 0/1, so int8 is plenty
+if pacsv is not None:
+    # Email bodies span lines inside quoted fields
+    table = pacsv.read_csv(
+        src,
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(column_types={'label': pa.int8()}),
+    )
+    labels = table.column('label').to_numpy()
+else:
+    df = pd.read_csv(src, dtype={'label': 'int8'})
+    labels = df['label'].to_numpy()
 
-train_df, valid_df = train_test_split(
-    df, test_size=0.2, random_state=42, stratify=df['label']
-)
+# Same indices train_test_split(test_size=0.2, random_state=42, stratify=label) picks,
+# without copying the frame into shuffled train/valid frames first
+sss = StratifiedShuffleSplit(n_splits=1, test_size=0.2, random_state=42)
+train_idx, valid_idx = next(sss.split(labels, labels))
 
 Path(dst_train).parent.mkdir(parents=True, exist_ok=True)
-train_df.to_csv(dst_train, index=False)
-valid_df.to_csv(dst_valid, index=False)
-print(f"Wrote {len(train_df)} → {dst_train}")
-print(f"Wrote {len(valid_df)} → {dst_valid}")
+if pacsv is not None:
+    pacsv.write_csv(table.take(train_idx), dst_train)
+    pacsv.write_csv(table.take(valid_idx), dst_valid)
+else:
+    df.iloc[train_idx].to_csv(dst_train, index=False)
+    df.iloc[valid_idx].to_csv(dst_valid, index=False)
+print(f"Wrote {len(train_idx)} → {dst_train}")
+print(f"Wrote {len(valid_idx)} → {dst_valid}")
@@ -11,10 +11,19 @@ from __future__ import annotations
 import argparse
 import csv
 import hashlib
+import itertools
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
+
+# pyarrow is optional; without it the sample CSV is read with the csv module
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except Exception:  # pragma: no cover - optional dependency
+    pa = pacsv = None  # type: ignore
 
 # Optional: load .env so MONGODB_URI/PHISH_CFG are picked up when running locally
 try:
@@ -29,39 +38,76 @@ ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
+from pymongo.write_concern import WriteConcern
+
 from core.config import load_config
 from core.db.mongodb import get_db, reset_db
 
+# Seed docs are disposable; don't wait for the server to acknowledge each batch
+UNACKED = WriteConcern(w=0)
+
+# Digests of the fixed sample names, computed once at import
+_PAYLOAD_SHA = hashlib.sha256(b"payload.exe").hexdigest()
+_INSTALLER_SHA = hashlib.sha256(b"installer.msi").hexdigest()
+_SCRIPT_SHA = hashlib.sha256(b"script.ps1").hexdigest()
+_EMPTY_SHA = hashlib.sha256(b"").hexdigest()
+
+# First `count` (text, label) pairs of the sample CSV
+def _read_phish_rows(path: Path, count: int) -> Tuple[List[str], List[int]]:
+    if pacsv is None:
+        with path.open(newline="", encoding="utf-8", errors="ignore") as f:
+            pairs = [(row.get("text") or "", int(row.get("label") or 0))
+                     for row in itertools.islice(csv.DictReader(f), count)]
+        return [t for t, _ in pairs], [l for _, l in pairs]
+
+    # Stream record batches and stop once enough rows are in, rather than parsing the whole file.
+    # Text is read as bytes so bad UTF-8 is dropped like errors="ignore" instead of failing.
+    reader = pacsv.open_csv(
+        path,
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=["text", "label"],
+            include_missing_columns=True,
+            column_types={"text": pa.binary(), "label": pa.int64()},
+        ),
+    )
+    batches, have = [], 0
+    for batch in reader:
+        batches.append(batch)
+        have += batch.num_rows
+        if have >= count:
+            break
+    table = pa.Table.from_batches(batches, schema=reader.schema).slice(0, count)
+    texts = [b.decode("utf-8", errors="ignore") if b else "" for b in table.column("text").to_pylist()]
+    labels = [l or 0 for l in table.column("label").to_pylist()]
+    return texts, labels
+
 # pylint: disable=import-error, wrong-import-position
 def load_phish_samples(path: Path, count: int, now: datetime) -> List[Dict[str, Any]]:
     rows: List[Dict[str, Any]] = []
 
-    # If the file doesn't exist, return empty list
-    if not path.exists():
+    # If nothing is requested or the file doesn't exist, return empty list
+    if count <= 0 or not path.exists():
         return rows
     
     # Read CSV and build sample documents
-    with path.open(newline="", encoding="utf-8", errors="ignore") as f:
-        reader = csv.DictReader(f)
-        for idx, row in enumerate(reader):
-            if idx >= count:
-                break
-            text = (row.get("text") or "").strip()
-            label = int(row.get("label") or 0)
-            ts = now - timedelta(hours=idx + 1)
-            rows.append(
-                # Build document
-                {
-                    "ts": ts,
-                    "label": label,
-                    "probability": 0.93 if label else 0.12,
-                    "threshold": 0.9,
-                    "subject": text[:60],
-                    "snippet": text[:160],
-                    "text_sha256": hashlib.sha256(text.encode("utf-8", errors="ignore")).hexdigest(),
-                    "source": "seed/reporting",
-                }
-            )
+    texts, labels = _read_phish_rows(path, count)
+    for idx, (text, label) in enumerate(zip(texts, labels)):
+        text = text.strip()
+        ts = now - timedelta(hours=idx + 1)
+        rows.append(
+            # Build document
+            {
+                "ts": ts,
+                "label": label,
+                "probability": 0.93 if label else 0.12,
+                "threshold": 0.9,
+                "subject": text[:60],
+                "snippet": text[:160],
+                "text_sha256": hashlib.sha256(text.encode()).hexdigest() if text else _EMPTY_SHA,
+                "source": "seed/reporting",
+            }
+        )
     return rows
 
 # pylint: disable=import-error, wrong-import-position
@@ -70,7 +116,7 @@ def malware_samples(count: int, now: datetime) -> List[Dict[str, Any]]:
     base = [
         {
             "filename": "payload.exe",
-            "sha256": hashlib.sha256(b"payload.exe").hexdigest(),
+            "sha256": _PAYLOAD_SHA,
             "probability": 0.86,
             "label": 1,
             "indicators": ["high_entropy", "suspicious_strings"],
@@ -79,7 +125,7 @@ def malware_samples(count: int, now: datetime) -> List[Dict[str, Any]]:
         # Second sample
         {
             "filename": "installer.msi",
-            "sha256": hashlib.sha256(b"installer.msi").hexdigest(),
+            "sha256": _INSTALLER_SHA,
             "probability": 0.18,
             "label": 0,
             "indicators": ["low_entropy"],
@@ -88,7 +134,7 @@ def malware_samples(count: int, now: datetime) -> List[Dict[str, Any]]:
         # Third sample
         {
             "filename": "script.ps1",
-            "sha256": hashlib.sha256(b"script.ps1").hexdigest(),
+            "sha256": _SCRIPT_SHA,
             "probability": 0.72,
             "label": 1,
             "indicators": ["powershell", "network_calls"],
@@ -156,6 +202,12 @@ def cleanup(db, collections: List[str]) -> None:
             deleted = db[name].delete_many({"source": "seed/reporting"}).deleted_count
             print(f"🧹 {name}: removed {deleted} seeded documents")
 
+# Fire-and-forget bulk insert; the server may apply the batch in any order.
+# Returns the number of docs sent: with w=0 there is no server count to report.
+def insert_unacked(collection, docs: List[Dict[str, Any]]) -> int:
+    collection.with_options(write_concern=UNACKED).insert_many(docs, ordered=False)
+    return len(docs)
+
 # pylint: disable=import-error, wrong-import-position
 # pylint: disable=too-many-locals
 def main() -> None:
@@ -197,20 +249,24 @@ def main() -> None:
     cleanup(db, list(collections.values()))
 
 
-# Insert documents
+    # Insert documents; the four batches are independent, so send them concurrently
+    # (pymongo drops the GIL on socket I/O, so wall time is the slowest batch, not the sum)
+    batches = [
+        (name, docs)
+        for name, docs in (
+            ("phishing", docs_phish),
+            ("malware", docs_mal),
+            ("pcap_analyses", docs_pcap),
+            ("pcap_threats", docs_threat),
+        )
+        if docs
+    ]
     inserted = {}
-    if docs_phish:
-        inserted["phishing"] = len(db[collections["phishing"]].insert_many(docs_phish).inserted_ids)
-
-        # Also create index on ts for phishing collection
-    if docs_mal:
-        inserted["malware"] = len(db[collections["malware"]].insert_many(docs_mal).inserted_ids)
-
-        # Also create index on ts for malware collection
-    if docs_pcap:
-        inserted["pcap_analyses"] = len(db[collections["pcap_analyses"]].insert_many(docs_pcap).inserted_ids)
-    if docs_threat:
-        inserted["pcap_threats"] = len(db[collections["pcap_threats"]].insert_many(docs_threat).inserted_ids)
+    if batches:
+        with ThreadPoolExecutor(max_workers=len(batches)) as pool:
+            counts = pool.map(lambda b: insert_unacked(db[collections[b[0]]], b[1]), batches)
+            for (name, _), count in zip(batches, counts):
+                inserted[name] = count
 
     for name, count in inserted.items():
         print(f"✅ Seeded {count} docs into {collections[name]}")